@@ -0,0 +1,187 @@
+import time
+import numpy as np
+from rich import print
+from grid_mdp import PRECISIONS, successor_table, packed_successor_table, bellman_backup, greedy_policy, value_iteration, modified_policy_iteration, gauss_seidel_value_iteration, prioritized_sweeping, batch_value_iteration, accelerated_value_iteration
+from policy_iteration import policy_iteration
+from parallel import parallel_value_iteration
+
+def random_grid(m: int, n: int, wall_fraction: float = 0.1, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Random encoded grid: small step costs, a few large rewards and scattered walls."""
+    rng = np.random.default_rng(seed)
+    g = rng.uniform(-1, 1, size=m * n)
+    g[rng.choice(m * n, size=max(1, m * n // 1000), replace=False)] = 100
+    walls = rng.random(m * n) < wall_fraction
+    g[walls] = 0.0
+    return g, walls
+
+def corridor_grid(rows: int, length: int) -> tuple[np.ndarray, np.ndarray, tuple[int, int]]:
+    """Serpentine one-cell-wide corridor with unit step costs and a -100 cell at the far end."""
+    m, n = 2 * rows - 1, length
+    walls = np.ones((m, n), dtype=bool)
+    walls[::2, :] = False
+    for r in range(1, m, 2):
+        walls[r, n - 1 if (r // 2) % 2 == 0 else 0] = False
+
+    g = np.where(walls, 0.0, 1.0)
+    g[m - 1, 0 if ((m - 1) // 2) % 2 else n - 1] = -100
+    return g.ravel(), walls.ravel(), (m, n)
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_value_vs_policy_iteration(sizes: list[int], action_probs: list[float], gamma: float, epsilon: float):
+    print(f"\nValue iteration vs policy iteration (gamma={gamma}, epsilon={epsilon})")
+    print(f"{'grid':<12} {'VI sweeps':<10} {'VI time':<10} {'PI iters':<10} {'PI time':<10} {'max |dW|':<10}")
+
+    for size in sizes:
+        g, walls = random_grid(size, size)
+        (vi_values, _, vi_sweeps), vi_time = timed(value_iteration, g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000)
+        (pi_values, _, pi_iters), pi_time = timed(policy_iteration, g, walls, (size, size), action_probs, gamma=gamma)
+
+        diff = np.abs(vi_values - pi_values).max()
+        print(f"{f'{size}x{size}':<12} {vi_sweeps:<10} {vi_time:<10.3f} {pi_iters:<10} {pi_time:<10.3f} {diff:<10.2e}")
+
+def bench_policy_extraction(sizes: list[int], action_probs: list[float], gamma: float, epsilon: float):
+    print(f"\nPolicy extraction: fused into the last sweep vs a separate greedy pass (gamma={gamma}, epsilon={epsilon})")
+    print(f"{'grid':<12} {'solve':<10} {'extra pass':<12} {'overhead':<10} {'identical':<10}")
+
+    for size in sizes:
+        g, walls = random_grid(size, size)
+        (values, policy, _), solve_time = timed(value_iteration, g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000)
+
+        # What extraction cost before: one more full pass over every action's expected value
+        greedy, extract_time = timed(greedy_policy, values, successor_table(size, size), action_probs)
+        print(f"{f'{size}x{size}':<12} {solve_time:<10.3f} {extract_time:<12.3f} {extract_time / solve_time:<10.1%} {str(np.array_equal(greedy[~walls], policy[~walls])):<10}")
+
+def bench_packed_storage(size: int, action_probs: list[float], gamma: float, sweeps: int, wall_fractions: list[float]):
+    print(f"\nFull-grid vs packed free-cell sweeps on {size}x{size} ({sweeps} sweeps, gamma={gamma})")
+    print(f"{'walls':<8} {'full MB':<10} {'packed MB':<10} {'full time':<10} {'packed time':<12} {'identical':<10}")
+
+    for wall_fraction in wall_fractions:
+        g, walls = random_grid(size, size, wall_fraction=wall_fraction)
+
+        def full_sweeps():
+            successors = successor_table(size, size)
+            values = np.where(walls, 0.0, g)
+            for _ in range(sweeps):
+                values = bellman_backup(values, g, walls, successors, action_probs, gamma)
+            return values
+
+        reference, full_time = timed(full_sweeps)
+        (values, _, _), packed_time = timed(value_iteration, g, walls, (size, size), action_probs, epsilon=0.0, gamma=gamma, max_iterations=sweeps)
+
+        # Working set of one sweep: the successor table plus the two value vectors
+        full_mb = (successor_table(size, size).nbytes + 2 * reference.nbytes) / 2**20
+        packed_mb = (packed_successor_table(walls, (size, size)).nbytes + 2 * 8 * ((~walls).sum() + 1)) / 2**20
+        print(f"{wall_fraction:<8} {full_mb:<10.1f} {packed_mb:<10.1f} {full_time:<10.3f} {packed_time:<12.3f} {str(np.array_equal(values, reference)):<10}")
+
+def bench_precision(size: int, action_probs: list[float], gamma: float, epsilon: float):
+    print(f"\nValue iteration precision on {size}x{size} (gamma={gamma}, epsilon={epsilon})")
+    print(f"{'precision':<10} {'sweeps':<10} {'time':<10} {'values MB':<10} {'max |dW|':<10} {'max |W-W*|':<12} {'same policy':<12}")
+
+    g, walls = random_grid(size, size)
+    free_cells = (~walls).sum() + 1
+    reference = None
+    # W* to well below epsilon, to see how far each solve stops from it
+    optimal = accelerated_value_iteration(g, walls, (size, size), action_probs, epsilon=epsilon * 1e-3, gamma=gamma, max_iterations=100_000, stopping="span")[0]
+    for precision in ["double", "single", "mixed"]:
+        (values, policy, sweeps), elapsed = timed(value_iteration, g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000, precision=precision)
+        reference = reference or (values, policy)
+
+        # The current and next value vectors, in the dtype the sweeps store them in
+        values_mb = 2 * free_cells * np.dtype(PRECISIONS[precision][0]).itemsize / 2**20
+        same_policy = np.array_equal(policy[~walls], reference[1][~walls])
+        print(f"{precision:<10} {sweeps:<10} {elapsed:<10.3f} {values_mb:<10.1f} {np.abs(values - reference[0]).max():<10.2e} {np.abs(values - optimal).max():<12.2e} {str(same_policy):<12}")
+
+def bench_modified_policy_iteration(size: int, action_probs: list[float], gamma: float, epsilon: float, modes: list):
+    print(f"\nModified policy iteration on {size}x{size} (gamma={gamma}, epsilon={epsilon})")
+    print(f"{'sweeps':<10} {'improvements':<14} {'total sweeps':<14} {'time':<10}")
+
+    g, walls = random_grid(size, size)
+    for mode in modes:
+        (_, _, iterations, total_sweeps), elapsed = timed(modified_policy_iteration, g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000, sweeps=mode)
+        print(f"{str(mode):<10} {iterations:<14} {total_sweeps:<14} {elapsed:<10.3f}")
+
+def bench_asynchronous_value_iteration(problems: list[tuple[str, np.ndarray, np.ndarray, tuple[int, int]]], action_probs: list[float], gamma: float, epsilon: float, prioritized_limit: int = 10**4):
+    print(f"\nSynchronous vs asynchronous value iteration (gamma={gamma}, epsilon={epsilon})")
+    print(f"{'grid':<16} {'solver':<24} {'sweeps':<10} {'time':<10}")
+
+    for name, g, walls, shape in problems:
+        free_cells = (~walls).sum()
+
+        (_, _, sweeps), elapsed = timed(value_iteration, g, walls, shape, action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000)
+        print(f"{name:<16} {'jacobi':<24} {sweeps:<10} {elapsed:<10.3f}")
+
+        for order in ["rows", "symmetric", "distance"]:
+            (_, _, sweeps), elapsed = timed(gauss_seidel_value_iteration, g, walls, shape, action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000, order=order)
+            print(f"{name:<16} {f'gauss-seidel ({order})':<24} {sweeps:<10} {elapsed:<10.3f}")
+
+        # Prioritized sweeping does single-cell backups in Python; report them in sweeps' worth
+        if free_cells > prioritized_limit:
+            print(f"{name:<16} {'prioritized sweeping':<24} {'-':<10} {'-':<10}")
+            continue
+        (_, _, backups), elapsed = timed(prioritized_sweeping, g, walls, shape, action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000)
+        print(f"{name:<16} {'prioritized sweeping':<24} {backups / free_cells:<10.1f} {elapsed:<10.3f}")
+
+def bench_parallel_value_iteration(size: int, action_probs: list[float], gamma: float, sweeps: int, worker_counts: list[int]):
+    print(f"\nTiled parallel value iteration on {size}x{size} ({sweeps} sweeps, gamma={gamma})")
+    print(f"{'workers':<10} {'time':<10} {'speedup':<10} {'identical':<10}")
+
+    g, walls = random_grid(size, size)
+    (reference, _, _), base_time = timed(value_iteration, g, walls, (size, size), action_probs, epsilon=0.0, gamma=gamma, max_iterations=sweeps)
+    print(f"{'serial':<10} {base_time:<10.3f} {1.0:<10.2f} {'-':<10}")
+
+    for workers in worker_counts:
+        (values, _), elapsed = timed(parallel_value_iteration, g, walls, (size, size), action_probs, epsilon=0.0, gamma=gamma, max_iterations=sweeps, workers=workers)
+        print(f"{workers:<10} {elapsed:<10.3f} {base_time / elapsed:<10.2f} {str(np.array_equal(values, reference)):<10}")
+
+def bench_batch_value_iteration(size: int, action_probs: list[float], gammas: np.ndarray, epsilon: float):
+    print(f"\nParameter sweep over {len(gammas)} discount factors in [{gammas.min()}, {gammas.max()}] on {size}x{size} (epsilon={epsilon})")
+
+    g, walls = random_grid(size, size)
+    start = time.perf_counter()
+    loop_sweeps = 0
+    for gamma in gammas:
+        _, _, sweeps = value_iteration(g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100_000)
+        loop_sweeps += sweeps
+    loop_time = time.perf_counter() - start
+
+    (_, _, iterations), batch_time = timed(batch_value_iteration, g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gammas, max_iterations=100_000)
+    print(f"one solve per setting: {loop_time:.3f}s ({loop_sweeps} sweeps)   batched: {batch_time:.3f}s ({iterations.sum()} sweeps)   {loop_time / batch_time:.1f}x")
+
+def bench_accelerated_value_iteration(size: int, action_probs: list[float], gammas: list[float], epsilon: float, wall_fraction: float = 0.1):
+    print(f"\nAccelerated value iteration on {size}x{size} with {wall_fraction:.0%} walls (epsilon={epsilon})")
+    print(f"{'gamma':<8} {'acceleration':<14} {'stopping':<10} {'backups':<10} {'saved':<10} {'time':<10}")
+
+    g, walls = random_grid(size, size, wall_fraction=wall_fraction)
+    for gamma in gammas:
+        baseline = None
+
+        # The sup rule only guarantees |W - W*| <= gamma / (1 - gamma) * epsilon; this
+        # is what it costs to guarantee epsilon, which the span rules do
+        (_, _, sweeps), elapsed = timed(accelerated_value_iteration, g, walls, (size, size), action_probs, epsilon=epsilon * (1 - gamma) / gamma, gamma=gamma, max_iterations=1_000_000, acceleration=None, stopping="sup")
+        print(f"{gamma:<8} {'None':<14} {'sup (eps)':<10} {sweeps:<10} {'-':<10} {elapsed:<10.3f}")
+
+        for acceleration in [None, "anderson"]:
+            for stopping in ["sup", "span", "policy"]:
+                (_, _, sweeps), elapsed = timed(accelerated_value_iteration, g, walls, (size, size), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=1_000_000, acceleration=acceleration, stopping=stopping)
+                baseline = baseline or sweeps
+                print(f"{gamma:<8} {str(acceleration):<14} {stopping:<10} {sweeps:<10} {baseline - sweeps:<10} {elapsed:<10.3f}")
+
+if __name__ == '__main__':
+    action_probs = [0.1, 0.8, 0.1]  # [counterclockwise, intended, clockwise]
+
+    bench_value_vs_policy_iteration([100, 300, 1000], action_probs, gamma=0.99, epsilon=1e-6)
+    bench_policy_extraction([300, 1000, 3000], action_probs, gamma=0.9, epsilon=1e-6)
+    bench_packed_storage(1000, action_probs, gamma=0.99, sweeps=50, wall_fractions=[0.1, 0.5, 0.8])
+    bench_precision(1000, action_probs, gamma=0.99, epsilon=1e-6)
+    bench_modified_policy_iteration(1000, action_probs, gamma=0.99, epsilon=1e-6, modes=[0, 1, 5, 20, "adaptive", "residual"])
+    bench_asynchronous_value_iteration([("5x100 corridor", *corridor_grid(5, 100))], action_probs, gamma=0.999, epsilon=1e-6)
+    bench_asynchronous_value_iteration([("30x30", *random_grid(30, 30), (30, 30)), ("300x300", *random_grid(300, 300), (300, 300))], action_probs, gamma=0.99, epsilon=1e-6)
+    bench_accelerated_value_iteration(100, action_probs, [0.99, 0.999], epsilon=1e-6)
+    bench_accelerated_value_iteration(100, action_probs, [0.99, 0.999], epsilon=1e-6, wall_fraction=0.0)
+    bench_batch_value_iteration(200, action_probs, np.linspace(0.5, 0.95, 100), epsilon=1e-6)
+    bench_batch_value_iteration(100, action_probs, np.full(50, 0.9), epsilon=1e-6)
+    bench_parallel_value_iteration(3000, action_probs, gamma=0.99, sweeps=20, worker_counts=[1, 2, 4, 8])
@@ -0,0 +1,1067 @@
+import functools
+import heapq
+import time
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+# Action order matches the Direction enum: LEFT, UP, RIGHT, DOWN (clockwise)
+MOVES = np.array([
+    [0, -1],  # LEFT
+    [-1, 0],  # UP
+    [0, 1],   # RIGHT
+    [1, 0]    # DOWN
+])
+
+# Slip outcomes relative to the intended action: [counterclockwise, intended, clockwise]
+SLIPS = [-1, 0, 1]
+
+# precision -> (dtype the values are stored in, dtype the backups are accumulated in)
+PRECISIONS = {
+    "double": (np.float64, np.float64),
+    "single": (np.float32, np.float32),
+    "mixed": (np.float32, np.float64)
+}
+
+def report_iteration(observer, start: float, iteration: int, residual: float, policy_changes: int | None = None):
+    """Send one iteration's telemetry to an observer (see observers.py), if there is one."""
+    if observer is not None:
+        observer({
+            "iteration": iteration,
+            "residual": float(residual),
+            "elapsed": time.perf_counter() - start,
+            "policy_changes": policy_changes
+        })
+
+def encode_grid(rewards: list[list[float]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a list-of-lists rewards grid into a flat float array and a wall mask.
+
+    Walls (None) are stored as 0 in the reward array so that gathering a wall's
+    value during a backup yields 0, exactly like the list-based iteration().
+    """
+    walls = np.array([[cell is None for cell in row] for row in rewards])
+    g = np.array([[0.0 if cell is None else cell for cell in row] for row in rewards], dtype=float)
+    return g.ravel(), walls.ravel()
+
+def to_grid(values: np.ndarray, walls: np.ndarray, shape: tuple[int, int]) -> list[list[float]]:
+    """Convert a flat value array back into a list-of-lists grid with None for walls."""
+    m, n = shape
+    values = values.reshape(m, n)
+    walls = walls.reshape(m, n)
+    return [
+        [None if walls[i, j] else values[i, j].item() for j in range(n)]
+        for i in range(m)
+    ]
+
+def move_table(walls: np.ndarray, shape: tuple[int, int], moves: np.ndarray = MOVES, blocking: bool = False) -> np.ndarray:
+    """
+    Flat index of the cell each actual move leads to from every cell, shape (D, m * n).
+
+    Moving off the edge of the grid leaves the agent in place. With blocking=True moving into a wall does too; otherwise
+    the move lands on the wall, which the solvers treat as absorbing with value 0.
+    """
+    m, n = shape
+    index = np.arange(m * n)
+    rows, cols = np.divmod(index, n)
+
+    next_index = np.empty((len(moves), m * n), dtype=np.int64)
+    for d, (dr, dc) in enumerate(moves):
+        next_rows = np.clip(rows + dr, 0, m - 1)
+        next_cols = np.clip(cols + dc, 0, n - 1)
+        next_index[d] = next_rows * n + next_cols
+        if blocking:
+            next_index[d] = np.where(walls[next_index[d]], index, next_index[d])
+    return next_index
+
+def slip_outcomes(n_moves: int = len(MOVES), slips: list[int] = SLIPS) -> np.ndarray:
+    """Actual move for every (intended action, slip outcome) of a cyclic slip model, shape (A, K)."""
+    return (np.arange(n_moves)[:, None] + np.array(slips)[None, :]) % n_moves
+
+def slip_matrix(action_probs: list[float], outcomes: np.ndarray | None = None, n_moves: int = len(MOVES)) -> np.ndarray:
+    """
+    Probability of every actual move under every intended action, shape (A, D), so
+    the expected values of a moves[outcomes] table are slip_matrix() @ values[moves].
+    """
+    if outcomes is None:
+        outcomes = slip_outcomes(n_moves)
+    mixing = np.zeros((len(outcomes), n_moves))
+    np.add.at(mixing, (np.arange(len(outcomes))[:, None], outcomes), np.asarray(action_probs, dtype=np.float64)[None, :])
+    return mixing
+
+@functools.lru_cache(maxsize=4)
+def successor_table(m: int, n: int) -> np.ndarray:
+    """
+    Precompute the flat index of the next cell for every (intended action, slip outcome, cell).
+
+    Returns a read-only int array of shape (4, 3, m * n), cached per grid size so
+    repeated solves on the same grid share it. Moving off the edge of the grid
+    leaves the agent in place.
+    """
+    table = move_table(np.zeros(m * n, dtype=bool), (m, n))[slip_outcomes()]
+    table.flags.writeable = False
+    return table
+
+def pack_index(walls: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Dense index over the free (non-wall) cells of a flat wall mask.
+
+    Returns (free, slot): free[i] is the flat cell of the i-th free cell, and slot
+    maps every cell to its position in a packed vector of free cells. All walls map
+    to one extra slot at the end, len(free), which the solvers keep at 0, so gathering
+    a wall still reads 0 and the packed vectors have len(free) + 1 entries.
+    """
+    free = np.flatnonzero(~walls)
+    slot = np.full(len(walls), len(free))
+    slot[free] = np.arange(len(free))
+    return free, slot
+
+def packed_successor_table(walls: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """successor_table() restricted to the free cells and renumbered into packed slots, shape (4, 3, F)."""
+    free, slot = pack_index(walls)
+    return np.ascontiguousarray(slot[successor_table(*shape)[:, :, free]])
+
+def packed_move_table(walls: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """move_table() restricted to the free cells and renumbered into packed slots, shape (4, F)."""
+    return packed_layout(walls, shape)[2]
+
+def packed_layout(walls: np.ndarray, shape: tuple[int, int], mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (free, slot, packed move table) of a grid with absorbing walls, see pack_index.
+
+    The solvers below take an optional compiled GridMDP of the same grid as mdp
+    (GridMDP.solve passes itself); its tables are then read instead of rebuilt, so
+    repeated solves of one grid compile it once.
+    """
+    if mdp is not None:
+        return mdp.free, mdp.slot, mdp.packed_moves
+    free, slot = pack_index(walls)
+    moves = np.ascontiguousarray(slot[move_table(np.zeros(len(walls), dtype=bool), shape)[:, free]])
+    return free, slot, moves
+
+def unpack(packed: np.ndarray, free: np.ndarray, size: int) -> np.ndarray:
+    """Scatter packed free-cell values (trailing wall slot optional) back onto a flat grid, 0 at walls."""
+    values = np.zeros(packed.shape[:-1] + (size,), dtype=packed.dtype)
+    values[..., free] = packed[..., :len(free)]
+    return values
+
+def expected_values(values: np.ndarray, successors: np.ndarray, action_probs: list[float]) -> np.ndarray:
+    """Expected next value for every intended action, shape (4, S)."""
+    expected = action_probs[0] * values[successors[:, 0]]
+    for k in range(1, len(action_probs)):
+        expected += action_probs[k] * values[successors[:, k]]
+    return expected
+
+def move_expected_values(values: np.ndarray, moves: np.ndarray, action_probs: list[float], outcomes: np.ndarray | None = None) -> np.ndarray:
+    """
+    expected_values() for a successor table of the form moves[outcomes].
+
+    Each cell's neighbour values are gathered once per move (4 gathers) instead of
+    once per (action, slip) pair (12), and then combined row by row. The products and
+    sums are the same, so the result is identical, for a third of the random reads.
+    """
+    if outcomes is None:
+        outcomes = slip_outcomes(len(moves))
+    neighbours = values[moves]
+    expected = action_probs[0] * neighbours[outcomes[:, 0]]
+    for k in range(1, len(action_probs)):
+        expected += action_probs[k] * neighbours[outcomes[:, k]]
+    return expected
+
+def min_over_actions(expected: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Min and argmin over the action axis of a (A, S) array.
+
+    Comparing against the row-wise min is faster than argmin(axis=0), which walks
+    the array with a large stride. Ties go to the lowest action, like argmin.
+    """
+    best = expected.min(axis=0)
+    best_action = np.zeros(expected.shape[1], dtype=np.int64)
+    for action in range(expected.shape[0] - 1, -1, -1):
+        best_action = np.where(expected[action] == best, action, best_action)
+    return best, best_action
+
+def greedy_policy(values: np.ndarray, successors: np.ndarray, action_probs: list[float], current: np.ndarray | None = None) -> np.ndarray:
+    """
+    Vectorized policy improvement: the action minimizing expected next value in every cell.
+
+    If a current policy is given, cells keep their action unless another one is strictly
+    better, so policy iteration cannot cycle between tied actions.
+    """
+    expected = expected_values(values, successors, action_probs)
+    _, policy = min_over_actions(expected)
+
+    if current is not None:
+        cells = np.arange(expected.shape[1])
+        keep = expected[current, cells] <= expected[policy, cells] + 1e-12
+        policy = np.where(keep, current, policy)
+
+    return policy
+
+def bellman_backup(values: np.ndarray, g: np.ndarray, walls: np.ndarray, successors: np.ndarray, action_probs: list[float], gamma: float) -> np.ndarray:
+    """
+    One synchronous Bellman sweep over the whole grid.
+
+    W_new(x) = g(x) + gamma * min_u sum_k p_k W(f(x, u, k)), with walls pinned to 0.
+    """
+    new_values = g + gamma * expected_values(values, successors, action_probs).min(axis=0)
+    new_values[walls] = 0.0
+    return new_values
+
+def block_backup(values: np.ndarray, g: np.ndarray, walls: np.ndarray, rows: tuple[int, int], action_probs: list[float], gamma: float, successors: dict | None = None) -> np.ndarray:
+    """
+    Bellman backup of the row block [r0, r1) of 2-D (m, n) grids.
+
+    Only the block plus a one-row halo above and below is read, so the arrays can be
+    memory-mapped and larger than RAM. Every cell gets exactly the same arithmetic
+    as in bellman_backup(), so sweeping all blocks reproduces it bit for bit.
+    Pass a dict as successors to cache the slab successor tables between calls.
+    """
+    m, n = values.shape
+    r0, r1 = rows
+    lo, hi = max(r0 - 1, 0), min(r1 + 1, m)
+
+    # Clamping at the slab edges matches the grid edges: a halo row is only missing
+    # where the block already touches the top or bottom of the grid
+    if successors is None:
+        successors = {}
+    if hi - lo not in successors:
+        successors[hi - lo] = successor_table(hi - lo, n)
+
+    slab = np.asarray(values[lo:hi]).ravel()
+    expected = expected_values(slab, successors[hi - lo], action_probs).min(axis=0)
+    expected = expected.reshape(hi - lo, n)[r0 - lo:r1 - lo]
+
+    new_values = np.asarray(g[r0:r1]) + gamma * expected
+    new_values[np.asarray(walls[r0:r1])] = 0.0
+    return new_values
+
+class GridMDP:
+    """
+    A grid layout and slip model compiled once into index arrays.
+
+    successors[a, k, x] is the flat index of the cell reached from cell x when action
+    a is intended and slip outcome k (probability probs[k]) happens. Solvers, belief
+    filters and simulators read these arrays instead of re-deriving moves cell by cell.
+
+    By default the actions and slips are those of this directory (MOVES, SLIPS) and
+    walls are absorbing. Other conventions are described with:
+        moves     -- (D, 2) row/column offset of every actual move
+        outcomes  -- (A, K) actual move for every (intended action, slip outcome);
+                     defaults to the cyclic [counterclockwise, intended, clockwise]
+        blocking  -- moving into a wall leaves the agent in place, as in 7/ and s9/
+    """
+
+    def __init__(self, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], g: np.ndarray | None = None, moves: np.ndarray = MOVES, outcomes: np.ndarray | None = None, blocking: bool = False):
+        m, n = shape
+        self.shape = (m, n)
+        self.walls = np.asarray(walls, dtype=bool).ravel()
+        self.g = np.zeros(m * n) if g is None else np.asarray(g, dtype=np.float64).ravel()
+        self.probs = np.asarray(action_probs, dtype=np.float64)
+        self.blocking = blocking
+
+        moves = np.asarray(moves)
+        self.outcomes = slip_outcomes(len(moves)) if outcomes is None else np.asarray(outcomes)
+        self.moves = move_table(self.walls, self.shape, moves, blocking).astype(np.int32)
+        self.successors = self.moves[self.outcomes]
+
+        # Packed free-cell layout (see pack_index): slot[x] is the position of cell x in
+        # a packed vector, and packed_successors indexes packed vectors directly
+        free, slot = pack_index(self.walls)
+        self.free, self.slot = free.astype(np.int32), slot.astype(np.int32)
+        self.packed_moves = np.ascontiguousarray(self.slot[self.moves[:, self.free]])
+        self.packed_successors = np.ascontiguousarray(self.slot[self.successors[:, :, self.free]])
+
+    @classmethod
+    def from_rewards(cls, rewards: list[list[float]], action_probs: list[float], **kwargs) -> "GridMDP":
+        """Compile a list-of-lists rewards grid with None for walls."""
+        g, walls = encode_grid(rewards)
+        return cls(walls, (len(rewards), len(rewards[0])), action_probs, g=g, **kwargs)
+
+    @property
+    def n_actions(self) -> int:
+        return self.successors.shape[0]
+
+    def index(self, cell: tuple[int, int]) -> int:
+        return cell[0] * self.shape[1] + cell[1]
+
+    def cell(self, index: int) -> tuple[int, int]:
+        return divmod(int(index), self.shape[1])
+
+    def pack(self, values: np.ndarray) -> np.ndarray:
+        """Packed copy of a flat grid array: its free cells plus the trailing 0 wall slot."""
+        return np.append(np.asarray(values)[..., self.free], np.zeros(np.shape(values)[:-1] + (1,)), axis=-1)
+
+    def unpack(self, packed: np.ndarray) -> np.ndarray:
+        return unpack(packed, self.free, len(self.walls))
+
+    def expected_values(self, values: np.ndarray) -> np.ndarray:
+        """Expected next value for every intended action, shape (A, S)."""
+        return expected_values(values, self.successors, self.probs)
+
+    def transition_matrices(self) -> list[sp.csr_matrix]:
+        """One sparse (S x S) transition matrix per intended action; rows of wall cells are empty."""
+        S = len(self.walls)
+        matrices = []
+        for action in range(self.n_actions):
+            rows = np.tile(self.free, len(self.probs))
+            cols = self.successors[action][:, self.free].ravel()
+            data = np.repeat(self.probs, len(self.free))
+            # Duplicate (row, col) pairs, e.g. two slips hitting the same edge, are summed
+            matrices.append(sp.csr_matrix((data, (rows, cols)), shape=(S, S)))
+        return matrices
+
+    def packed_transition_matrices(self) -> list[sp.csr_matrix]:
+        """
+        transition_matrices() over the free cells only, (F x F) in packed slot order.
+
+        Moves into a wall are dropped: walls are worth 0, so that mass adds nothing.
+        """
+        F = len(self.free)
+        matrices = []
+        for action in range(self.n_actions):
+            rows = np.tile(np.arange(F), len(self.probs))
+            cols = self.packed_successors[action].ravel()
+            data = np.repeat(self.probs, F)
+            keep = cols < F
+            matrices.append(sp.csr_matrix((data[keep], (rows[keep], cols[keep])), shape=(F, F)))
+        return matrices
+
+    def step(self, index: int, action: int, rng: np.random.Generator) -> int:
+        """Sample the cell reached from cell `index` when `action` is intended."""
+        return int(self.successors[action, rng.choice(len(self.probs), p=self.probs), index])
+
+    def solve(self, solver, **kwargs):
+        """
+        Run one of this module's solvers, e.g. mdp.solve(value_iteration, gamma=0.99),
+        on this model's compiled tables.
+        """
+        if self.blocking or not np.array_equal(self.outcomes, slip_outcomes(len(self.packed_moves))):
+            raise ValueError("The grid solvers assume absorbing walls and the default slips")
+        return solver(self.g, self.walls, self.shape, self.probs, mdp=self, **kwargs)
+
+def low_precision_converged(residual: float, values: np.ndarray, epsilon: float) -> bool:
+    """
+    Whether sweeps in values.dtype have gone as far as they can.
+
+    Rounding keeps the residual of float32 sweeps around the spacing of the largest
+    values, so they stop there (or at epsilon, if that is looser) and hand over to
+    float64 sweeps.
+    """
+    return residual < max(epsilon, 4 * np.finfo(values.dtype).eps * np.abs(values).max())
+
+def value_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, observer=None, return_q: bool = False, precision: str = "double", mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Vectorized value iteration on an encoded grid.
+
+    Sweeps run on packed vectors of the free cells only (see pack_index), so walls
+    cost neither memory nor work; on maze-like grids that is most of the grid.
+
+    precision:
+        "double"  -- float64 throughout
+        "single"  -- float32 values and arithmetic
+        "mixed"   -- float32 values, backups accumulated in float64
+    In "single" and "mixed" the float32 sweeps run until rounding stalls them (see
+    low_precision_converged), then float64 polishing sweeps finish the solve. These
+    stop on the MacQueen bounds (see macqueen_bounds) once they are less than epsilon
+    apart and return their midpoint, so the values are within epsilon / 2 of the
+    float64 fixed point W*. "double" stops when max |TW - W| < epsilon, which
+    leaves it up to gamma / (1 - gamma) * epsilon from W*, so the two can differ
+    by more than epsilon. The polishing sweeps count towards max_iterations.
+
+    If an observer is given it is called after every sweep with the iteration
+    telemetry, including how many cells changed their greedy action.
+
+    Returns the flat value array, the greedy policy and the number of sweeps
+    performed. The policy is the argmin of the last sweep's expected values, so it
+    is greedy with respect to the returned values when the solve converged and
+    costs no extra pass over the grid. With return_q=True the (4, S) Q-values of
+    that sweep are returned as well.
+
+    Like the other solvers, it reads its tables from mdp when one is given (see
+    packed_layout).
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    dtype, accumulate = PRECISIONS[precision]
+
+    free, slot, moves = packed_layout(walls, shape, mdp)
+    g_free = g[free].astype(accumulate)
+    probs = np.asarray(action_probs, dtype=accumulate)
+    values = np.append(g_free, 0.0).astype(dtype)
+    start = time.perf_counter()
+    policy = None
+    polishing = False
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        expected = move_expected_values(values, moves, probs)
+        new_values = np.empty_like(values)
+        new_values[-1] = 0.0
+        if observer is None:
+            new_values[:-1] = g_free + gamma * expected.min(axis=0)
+            policy_changes = None
+        else:
+            best, new_policy = min_over_actions(expected)
+            new_values[:-1] = g_free + gamma * best
+            policy_changes = None if policy is None else int((new_policy != policy).sum())
+            policy = new_policy
+
+        max_diff = np.abs(new_values - values).max()
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff, policy_changes)
+
+        if values.dtype != np.float64 and low_precision_converged(max_diff, new_values, epsilon):
+            # Polish in float64 from here on
+            values = new_values.astype(np.float64)
+            g_free, probs = g[free].astype(np.float64), np.asarray(action_probs, dtype=np.float64)
+            polishing = True
+            continue
+
+        if polishing:
+            lo, hi = macqueen_bounds(values[:-1], new_values[:-1], gamma, absorbing=bool((moves == len(free)).any()))
+            if hi - lo < epsilon:
+                values = new_values + (lo + hi) / 2
+                values[-1] = 0.0
+                break
+        elif max_diff < epsilon:
+            break
+
+        values = new_values
+
+    if iteration_count == 0:
+        expected = move_expected_values(values, moves, probs)
+    if observer is None or iteration_count == 0:
+        _, policy = min_over_actions(expected)
+
+    S = len(walls)
+    values = values.astype(np.float64)
+    if return_q:
+        return unpack(values, free, S), unpack(policy, free, S), iteration_count, unpack(g_free + gamma * expected, free, S)
+    return unpack(values, free, S), unpack(policy, free, S), iteration_count
+
+def transition_matrices(walls: np.ndarray, shape: tuple[int, int], action_probs: list[float]) -> list[sp.csr_matrix]:
+    """
+    Compile the slip model into one sparse (S x S) transition matrix per intended action.
+
+    Rows of wall cells are empty, so a wall behaves like an absorbing state worth 0,
+    the same way value iteration treats it. Pass an all-False mask to treat walls as
+    ordinary zero-reward cells instead.
+    """
+    return GridMDP(walls, shape, action_probs).transition_matrices()
+
+def policy_matrix(matrices: list[sp.csr_matrix], policy: np.ndarray) -> sp.csr_matrix:
+    """Select, for every cell, the row of the transition matrix of the action the policy takes."""
+    P = sp.csr_matrix(matrices[0].shape)
+    for action, matrix in enumerate(matrices):
+        P = P + sp.diags((policy == action).astype(float)) @ matrix
+    return P.tocsr()
+
+def evaluate_policy(P: sp.csr_matrix, g: np.ndarray, gamma: float, method: str = "auto", x0: np.ndarray | None = None, tol: float = 1e-10) -> np.ndarray:
+    """
+    Solve (I - gamma P) W = g for the value of a fixed policy.
+
+    method="direct" uses a sparse LU solve; method="iterative" uses BiCGSTAB,
+    optionally warm-started from x0. method="auto" picks the direct solve for small
+    grids and BiCGSTAB for large ones, where LU fill-in gets expensive.
+    """
+    A = (sp.identity(P.shape[0], format="csr") - gamma * P).tocsc()
+
+    if method == "auto":
+        method = "direct" if P.shape[0] <= 10_000 else "iterative"
+
+    if method == "direct":
+        return spla.spsolve(A, g)
+    elif method == "iterative":
+        values, info = spla.bicgstab(A, g, x0=x0, rtol=tol, atol=0.0)
+        if info != 0:
+            raise RuntimeError(f"Policy evaluation did not converge (info={info})")
+        return values
+
+    raise ValueError(f"Unknown method: {method}")
+
+def policy_backup(values: np.ndarray, g: np.ndarray, policy_successors: np.ndarray, action_probs: list[float], gamma: float) -> np.ndarray:
+    """
+    One evaluation sweep of a fixed policy on packed vectors, given its (3, F)
+    successor slots and the costs g of the free cells. The wall slot stays 0.
+    """
+    expected = action_probs[0] * values[policy_successors[0]]
+    for k in range(1, len(action_probs)):
+        expected += action_probs[k] * values[policy_successors[k]]
+    new_values = np.empty_like(values)
+    new_values[:-1] = g + gamma * expected
+    new_values[-1] = 0.0
+    return new_values
+
+def modified_policy_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 1000, sweeps: int | str = 5, max_sweeps: int = 100, residual_ratio: float = 0.1, observer=None, mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, int, int]:
+    """
+    Modified policy iteration: one greedy Bellman backup, then a number of partial
+    evaluation sweeps of the resulting policy, repeated until the backup changes
+    the values by less than epsilon.
+
+    sweeps controls the evaluation depth:
+        int         -- that many evaluation sweeps per improvement (0 is value iteration)
+        "adaptive"  -- start at 1, double while the policy is unchanged, halve when it changes
+        "residual"  -- sweep until the evaluation step is below residual_ratio times the
+                       last Bellman residual
+
+    All modes are capped at max_sweeps. Backups and evaluations run on packed
+    vectors of the free cells (see pack_index). The observer, if any, is called once
+    per improvement step. Returns the flat values, the flat policy, the number of
+    improvement steps and the total number of sweeps (backups plus evaluations).
+    """
+    if not isinstance(sweeps, int) and sweeps not in ("adaptive", "residual"):
+        raise ValueError(f"Unknown sweeps mode: {sweeps}")
+
+    free, slot, moves = packed_layout(walls, shape, mdp)
+    successors = moves[slip_outcomes(len(moves))]
+    cells = np.arange(len(free))
+    g_free = g[free]
+    values = np.append(g_free, 0.0)
+    policy = None
+    depth = 1
+    start = time.perf_counter()
+
+    iteration_count = 0
+    total_sweeps = 0
+    while iteration_count < max_iterations:
+        # Improvement: a full Bellman backup, remembering the minimizing action
+        expected = move_expected_values(values, moves, action_probs)
+        best, new_policy = min_over_actions(expected)
+        if policy is not None:
+            new_policy = np.where(expected[policy, cells] <= best + 1e-12, policy, new_policy)
+        new_values = np.append(g_free + gamma * best, 0.0)
+        residual = np.abs(new_values - values).max()
+        iteration_count += 1
+        total_sweeps += 1
+        policy_changes = None if policy is None else int((new_policy != policy).sum())
+        report_iteration(observer, start, iteration_count, residual, policy_changes)
+
+        if residual < epsilon:
+            policy = new_policy
+            break
+
+        if sweeps == "adaptive" and policy is not None:
+            changed = not np.array_equal(new_policy, policy)
+            depth = max(1, depth // 2) if changed else min(2 * depth, max_sweeps)
+
+        policy = new_policy
+        values = new_values
+
+        # Partial evaluation of the current policy
+        budget = depth if sweeps == "adaptive" else (sweeps if isinstance(sweeps, int) else max_sweeps)
+        if budget > 0:
+            policy_successors = successors[policy, :, cells].T
+        for _ in range(min(budget, max_sweeps)):
+            new_values = policy_backup(values, g_free, policy_successors, action_probs, gamma)
+            step = np.abs(new_values - values).max()
+            values = new_values
+            total_sweeps += 1
+
+            if sweeps == "residual" and step < residual_ratio * residual:
+                break
+
+    S = len(walls)
+    policy = None if policy is None else unpack(policy, free, S)
+    return unpack(values, free, S), policy, iteration_count, total_sweeps
+
+def distance_groups(walls: np.ndarray, shape: tuple[int, int], sources: np.ndarray) -> list[np.ndarray]:
+    """
+    Group free cells by breadth-first distance from the source cells.
+
+    Unreachable free cells are put in one last group so every cell is still swept.
+    """
+    neighbors = successor_table(*shape)[:, 1]
+    distance = np.full(len(walls), -1)
+    frontier = np.flatnonzero(sources & ~walls)
+    distance[frontier] = 0
+
+    groups = []
+    while len(frontier) > 0:
+        groups.append(frontier)
+        candidates = np.unique(neighbors[:, frontier])
+        frontier = candidates[(distance[candidates] == -1) & ~walls[candidates]]
+        distance[frontier] = len(groups)
+
+    unreached = np.flatnonzero((distance == -1) & ~walls)
+    if len(unreached) > 0:
+        groups.append(unreached)
+
+    return groups
+
+def sweep_orders(walls: np.ndarray, shape: tuple[int, int], g: np.ndarray, order: str) -> list[list[np.ndarray]]:
+    """
+    Build the cell groups for each Gauss-Seidel sweep, cycled through in turn.
+
+    Groups are updated one after the other, each seeing the values the earlier
+    groups of the same sweep just wrote; the cells inside a group are updated together.
+        "rows"       -- row by row, each row left to right
+        "symmetric"  -- from each corner of the grid in turn
+        "distance"   -- outward from the cells with the largest |g(x)|
+    A cell's neighbours lie on the diagonals just before and after its own, so
+    "rows" and "symmetric" update one diagonal at a time (m + n - 1 groups per sweep)
+    and still give exactly the cell-by-cell result. "distance" takes one group per
+    breadth-first layer, which on a corridor is one group per cell.
+    """
+    m, n = shape
+    free = np.flatnonzero(~walls)
+    rows, cols = np.divmod(free, n)
+
+    def diagonals(key: np.ndarray) -> list[np.ndarray]:
+        index = np.argsort(key, kind="stable")
+        return np.split(free[index], np.flatnonzero(np.diff(key[index])) + 1)
+
+    if order == "rows":
+        return [diagonals(rows + cols)]
+    elif order == "symmetric":
+        # Top-left, bottom-right, top-right and bottom-left corner first
+        down, across = diagonals(rows + cols), diagonals(rows - cols)
+        return [down, down[::-1], across, across[::-1]]
+    elif order == "distance":
+        magnitude = np.where(walls, 0.0, np.abs(g))
+        return [distance_groups(walls, shape, magnitude == magnitude.max())]
+
+    raise ValueError(f"Unknown sweep order: {order}")
+
+def self_loop_backup_tables(moves: np.ndarray, cells: np.ndarray, mixing: np.ndarray, gamma: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For the packed cells, their move table with moves that stay in place sent to the
+    wall slot, and 1 / (1 - gamma p) for the probability p that each action stays.
+    """
+    cell_moves = moves[:, cells]
+    stays = cell_moves == cells
+    scale = 1.0 / (1.0 - gamma * (mixing @ stays))
+    return np.where(stays, moves.shape[1], cell_moves), scale
+
+def gauss_seidel_value_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, order: str = "rows", observer=None, mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    In-place (Gauss-Seidel) value iteration on packed free-cell vectors.
+
+    The grid is updated one group of cells at a time (see sweep_orders), so values
+    written earlier in a sweep are used immediately instead of waiting for the next
+    sweep. As in Gauss-Seidel for linear systems, each cell solves for its own term
+    instead of reading it: with p the probability that action u leaves x in place,
+
+        W(x) = min_u (g(x) + gamma sum_{y != x} P(y|x,u) W(y)) / (1 - gamma p),
+
+    which has the same fixed point as the Bellman update. A cell that mostly bumps
+    into the edges, like a goal in a corner, then settles in one update instead of
+    converging at rate gamma.
+
+    It needs about half the sweeps of value_iteration() on open grids and far fewer
+    on corridors, but every group is a separate NumPy call, so a sweep costs
+    more than a synchronous one; it is only faster in wall time on large grids.
+
+    Returns the flat value array, the greedy policy of the last sweep and the
+    number of sweeps performed.
+    """
+    free, slot, moves = packed_layout(walls, shape, mdp)
+    mixing = slip_matrix(action_probs)
+    g_free = g[free]
+
+    orders = []
+    for groups in sweep_orders(walls, shape, g, order):
+        tables = []
+        for group in groups:
+            cells = slot[group]
+            cell_moves, scale = self_loop_backup_tables(moves, cells, mixing, gamma)
+            tables.append((cells, cell_moves, g_free[cells] * scale, gamma * scale))
+        orders.append(tables)
+
+    values = np.append(g_free, 0.0)
+    start = time.perf_counter()
+    last_sweep = []
+    policy = None
+
+    def sweep_policy():
+        # Every cell's action comes from its own backup in the last sweep
+        actions = np.zeros(len(free), dtype=np.int64)
+        for cells, expected in last_sweep:
+            actions[cells] = expected.argmin(axis=0)
+        return actions
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        previous = values.copy()
+        last_sweep = []
+        for cells, cell_moves, offset, scale in orders[iteration_count % len(orders)]:
+            expected = offset + scale * (mixing @ values[cell_moves])
+            last_sweep.append((cells, expected))
+            values[cells] = expected.min(axis=0)
+
+        max_diff = np.abs(values - previous).max()
+        iteration_count += 1
+        if observer is None:
+            policy_changes = None
+        else:
+            new_policy = sweep_policy()
+            policy_changes = None if policy is None else int((new_policy != policy).sum())
+            policy = new_policy
+        report_iteration(observer, start, iteration_count, max_diff, policy_changes)
+
+        if max_diff < epsilon:
+            break
+
+    policy = sweep_policy()
+
+    return unpack(values, free, len(walls)), unpack(policy, free, len(walls)), iteration_count
+
+def prioritized_sweeping(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Asynchronous value iteration driven by a max-heap of Bellman error bounds.
+
+    One cell is backed up at a time, solving for its own term as
+    gauss_seidel_value_iteration() does, which leaves its Bellman error at 0. A
+    change of delta in cell y then raises the error bound of every cell x that can
+    move into y by gamma * max_u P(y|x,u) * delta, without backing x up. Cells are
+    queued, once, when their bound reaches epsilon, and popped largest bound first.
+    The solve stops when the queue is empty, which proves max |TW - W| < epsilon like
+    value_iteration()'s stopping rule, or after max_iterations sweeps' worth of backups.
+
+    This pays off when a few cells drive the solve, as on a corridor. On open grids
+    with gamma near 1 the bounds stay loose and it does several times the backups
+    of value_iteration(), each of them in Python.
+
+    Returns the flat value array, the policy of each cell's last backup and the
+    number of single-cell backups, counting the vectorized backup of every cell that
+    seeds the bounds.
+    """
+    free, slot, moves = packed_layout(walls, shape, mdp)
+    mixing = slip_matrix(action_probs)
+    cells = np.arange(len(free))
+    cell_moves, scale = self_loop_backup_tables(moves, cells, mixing, gamma)
+
+    # Per cell and action: (probability, packed successor) of every move that leaves
+    # the cell, and the offset and scale of its backup, as plain lists for fast access
+    outcomes = [[[(p, int(y)) for p, y in zip(row, cell_moves[:, x]) if p > 0 and y != len(free)] for row in mixing] for x in cells]
+    offsets = (g[free] * scale).T.tolist()
+    scales = (gamma * scale).T.tolist()
+
+    # Predecessors of every cell with gamma * max_u P(y|x,u), ignoring self-loops
+    weights = gamma * np.einsum("ad,dex->aex", mixing, (cell_moves[:, None, :] == cell_moves[None, :, :])).max(axis=0)
+    predecessors = [[] for _ in range(len(free) + 1)]
+    for d in range(len(moves)):
+        for x, y, w in zip(cells.tolist(), cell_moves[d].tolist(), weights[d].tolist()):
+            if y != len(free) and (x, w) not in predecessors[y]:
+                predecessors[y].append((x, w))
+
+    def backup(x):
+        q_values = [
+            offset + s * sum(p * values[y] for p, y in moves_x)
+            for moves_x, offset, s in zip(outcomes[x], offsets[x], scales[x])
+        ]
+        action = q_values.index(min(q_values))
+        return q_values[action], action
+
+    # Seed the bounds with the exact errors of one vectorized Bellman backup
+    values = np.append(g[free], 0.0)
+    best, policy = min_over_actions(move_expected_values(values, moves, action_probs))
+    bound = np.abs(best * gamma + g[free] - values[:-1]).tolist()
+    policy = policy.tolist()
+    values = values.tolist()
+    queued = [b >= epsilon for b in bound]
+    heap = [(-b, x) for x, b in enumerate(bound) if b >= epsilon]
+    heapq.heapify(heap)
+
+    backups = len(free)
+    max_backups = max_iterations * len(free)
+    while heap and backups < max_backups:
+        _, x = heapq.heappop(heap)
+        queued[x] = False
+        new_value, policy[x] = backup(x)
+        change = abs(new_value - values[x])
+        values[x] = new_value
+        bound[x] = 0.0
+        backups += 1
+
+        for x_prev, w in predecessors[x]:
+            bound[x_prev] += w * change
+            if bound[x_prev] >= epsilon and not queued[x_prev]:
+                queued[x_prev] = True
+                heapq.heappush(heap, (-bound[x_prev], x_prev))
+
+    return unpack(np.array(values), free, len(walls)), unpack(np.array(policy), free, len(walls)), backups
+
+def batch_sweeps(values: np.ndarray, g: np.ndarray, moves: np.ndarray, action_probs: np.ndarray, gamma: np.ndarray, epsilon: float, max_iterations: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Value iteration sweeps over a batch axis of packed problems.
+
+    values is (R, F + 1) with the wall slot last, g (R, F), action_probs (R, K) and
+    gamma (R,). The sweeps store the batch as the fast axis, (F + 1, R): one
+    values[moves] gather per sweep then reads each neighbour's R values from
+    contiguous memory, and problems with the same slip model are mixed into
+    expected values by a single matrix product (see slip_matrix). A problem leaves
+    the working set as soon as it meets value_iteration()'s stopping rule, so the
+    remaining sweeps only cost what is left.
+
+    Returns the (R, F + 1) values and (R, F) greedy policies of each problem's last
+    sweep, as value_iteration() returns them, and the (R,) number of sweeps per problem.
+    """
+    # Problems with the same slip model next to each other
+    order = np.lexsort(np.asarray(action_probs).T[::-1])
+    result = np.empty_like(values)
+    policy = np.zeros(g.shape, dtype=np.int64)
+    iterations = np.zeros(len(values), dtype=int)
+
+    active = order
+    values = np.ascontiguousarray(values[order].T)
+    g = np.ascontiguousarray(g[order].T)
+    probs, gamma = np.asarray(action_probs)[order], np.asarray(gamma)[order]
+    n_moves, n_free = moves.shape
+    n_actions = len(slip_matrix(probs[0], n_moves=n_moves))
+
+    while len(active) > 0:
+        # Work buffers for this working set, reused until a problem drops out
+        batch = len(active)
+        expected = np.empty((n_actions, n_free, batch))
+        best = np.empty((n_free, batch))
+        diff = np.empty_like(values)
+        new_values = np.empty_like(values)
+        new_values[-1] = 0.0
+        bounds = np.concatenate(([0], np.flatnonzero((probs[1:] != probs[:-1]).any(axis=1)) + 1, [batch]))
+        mixings = [slip_matrix(probs[lo], n_moves=n_moves) for lo in bounds[:-1]]
+
+        while True:
+            neighbours = values[moves]
+            if len(mixings) == 1:
+                np.matmul(mixings[0], neighbours.reshape(n_moves, -1), out=expected.reshape(n_actions, -1))
+            else:
+                for mixing, lo, hi in zip(mixings, bounds[:-1], bounds[1:]):
+                    expected[:, :, lo:hi] = (mixing @ neighbours[:, :, lo:hi].reshape(n_moves, -1)).reshape(n_actions, n_free, hi - lo)
+            np.min(expected, axis=0, out=best)
+            np.multiply(best, gamma, out=new_values[:-1])
+            new_values[:-1] += g
+
+            np.subtract(new_values, values, out=diff)
+            max_diff = np.abs(diff, out=diff).max(axis=0)
+            iterations[active] += 1
+            converged = max_diff < epsilon
+            done = converged | (iterations[active] >= max_iterations)
+            if done.any():
+                break
+            values, new_values = new_values, values
+
+        # Like value_iteration(), a converged problem keeps the values it was backed
+        # up from, and its policy is the argmin of that last sweep
+        finished = active[done]
+        result[finished] = np.where(converged[done], values[:, done], new_values[:, done]).T
+        policy[finished] = expected[:, :, done].argmin(axis=0).T
+
+        keep = ~done
+        active, values, g = active[keep], np.ascontiguousarray(new_values[:, keep]), np.ascontiguousarray(g[:, keep])
+        probs, gamma = probs[keep], gamma[keep]
+
+    return result, policy, iterations
+
+def batch_value_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs, epsilon: float = 1e-6, gamma=0.9, max_iterations: int = 100, mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Solve many value iteration problems that share one grid topology.
+
+    g may be a single flat reward array (S,) or a stack (B, S); action_probs may be
+    one slip model (K,) or one per problem (B, K); gamma may be a scalar or (B,).
+    Anything given once is broadcast over the batch.
+
+    The problems are swept together over a leading batch axis (see batch_sweeps),
+    and converged problems drop out of the sweeps. On top of that:
+        -- a setting repeated in the batch is solved once
+        -- problems with the same rewards and slip model are solved in rounds: the
+           lowest and highest gamma first, then, round by round, the problem halfway
+           between two solved ones, starting from the linear interpolation of their
+           solutions in gamma
+    The sweeps and stopping rule are value_iteration()'s, so every result is within
+    the same tolerance of W* as a separate solve.
+
+    Returns the (B, S) value arrays, the (B, S) greedy policies and the (B,) number
+    of sweeps spent on each problem, 0 for repeats of an earlier setting.
+    """
+    action_probs = np.asarray(action_probs, dtype=float)
+    gamma = np.asarray(gamma, dtype=float)
+    g = np.asarray(g, dtype=float)
+    batch = max(g.shape[0] if g.ndim == 2 else 1, action_probs.shape[0] if action_probs.ndim == 2 else 1, gamma.size)
+
+    g = np.broadcast_to(g, (batch, g.shape[-1]))
+    action_probs = np.broadcast_to(action_probs, (batch, action_probs.shape[-1]))
+    gamma = np.broadcast_to(gamma.ravel() if gamma.ndim else gamma, (batch,))
+
+    free, _, moves = packed_layout(walls, shape, mdp)
+    values = np.zeros((batch, len(free) + 1))
+    policy = np.zeros((batch, len(free)), dtype=np.int64)
+    iterations = np.zeros(batch, dtype=int)
+
+    # Problems with the same rewards and slip model, and their distinct gammas in order
+    groups = {}
+    for b in range(batch):
+        groups.setdefault((g[b].tobytes(), action_probs[b].tobytes()), {}).setdefault(gamma[b], []).append(b)
+
+    # rounds[r] lists (problem, lower neighbour, upper neighbour) to solve in round r
+    rounds = [[]]
+    for by_gamma in groups.values():
+        members = [by_gamma[key][0] for key in sorted(by_gamma)]
+        rounds[0] += [(b, None, None) for b in {members[0], members[-1]}]
+        spans = [(0, len(members) - 1)]
+        depth = 1
+        while spans:
+            next_spans = []
+            for i, j in spans:
+                if j - i < 2:
+                    continue
+                k = (i + j) // 2
+                if len(rounds) == depth:
+                    rounds.append([])
+                rounds[depth].append((members[k], members[i], members[j]))
+                next_spans += [(i, k), (k, j)]
+            spans = next_spans
+            depth += 1
+
+    for problems in rounds:
+        rows = np.array([b for b, _, _ in problems])
+        start = np.empty((len(rows), len(free) + 1))
+        for r, (b, lo, hi) in enumerate(problems):
+            if lo is None:
+                start[r] = np.append(g[b, free], 0.0)
+            else:
+                t = (gamma[b] - gamma[lo]) / (gamma[hi] - gamma[lo])
+                start[r] = values[lo] + t * (values[hi] - values[lo])
+        values[rows], policy[rows], iterations[rows] = batch_sweeps(start, g[rows][:, free], moves, action_probs[rows], gamma[rows], epsilon, max_iterations)
+
+    # Repeats of a setting take the solution of its first occurrence
+    for by_gamma in groups.values():
+        for first, *repeats in by_gamma.values():
+            values[repeats], policy[repeats] = values[first], policy[first]
+
+    S = len(walls)
+    return unpack(values, free, S), unpack(policy, free, S), iterations
+
+def macqueen_bounds(values: np.ndarray, new_values: np.ndarray, gamma: float, absorbing: bool = False) -> tuple[float, float]:
+    """
+    MacQueen bounds from one backup W -> TW of the free cells' values: for every free cell,
+        TW + lo <= W* <= TW + hi,  with lo, hi = gamma / (1 - gamma) * (min, max) of (TW - W).
+    Pass absorbing=True if the free cells can move into walls: those are worth
+    exactly 0 and absorb the probability, so 0 is included in the min and max to
+    keep the bounds valid.
+    """
+    diff = new_values - values
+    lo, hi = diff.min(), diff.max()
+    if absorbing:
+        lo, hi = min(lo, 0.0), max(hi, 0.0)
+    scale = gamma / (1 - gamma)
+    return scale * lo, scale * hi
+
+def interchangeable_actions(moves: np.ndarray, action_probs: list[float]) -> np.ndarray:
+    """
+    For a packed move table, whether two intended actions give the same distribution
+    over next cells in each cell, e.g. because both bump into the same edge; shape (A, A, F).
+    """
+    mixing = slip_matrix(action_probs, n_moves=len(moves))
+    # mass[a, e, x]: probability that action a ends where move e leads from x
+    mass = np.einsum("ad,dex->aex", mixing, moves[:, None, :] == moves[None, :, :])
+    return np.stack([np.stack([np.isclose(mass[a], mass[b]).all(axis=0) for b in range(len(mixing))]) for a in range(len(mixing))])
+
+def accelerated_value_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, acceleration: str | None = "anderson", memory: int = 5, stopping: str = "sup", observer=None, return_q: bool = False, mdp: "GridMDP | None" = None) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Value iteration with convergence acceleration and sharper stopping rules.
+
+    acceleration:
+        None        -- plain value iteration steps
+        "anderson"  -- Anderson mixing of the last `memory` backups
+    Anderson steps are safeguarded: a step whose residual is worse than the residual
+    the current history started from is thrown away, the history is restarted from
+    the latest backup and a plain backup is taken instead.
+
+    stopping:
+        "sup"     -- stop when max |TW - W| < epsilon, as value_iteration() does
+        "span"    -- stop when the MacQueen bounds on W* are less than epsilon apart,
+                     and return their midpoint
+        "policy"  -- as "span", but also stop as soon as the bounds prove the greedy
+                     policy optimal in every cell
+
+    Returns the flat values, the greedy policy of the last backup and the number of
+    backups performed, plus that backup's (4, S) Q-values with return_q=True.
+    """
+    if acceleration not in (None, "anderson"):
+        raise ValueError(f"Unknown acceleration: {acceleration}")
+    if stopping not in ("sup", "span", "policy"):
+        raise ValueError(f"Unknown stopping rule: {stopping}")
+
+    # Work on packed free cells; the trailing wall slot stays 0 throughout
+    free, slot, moves = packed_layout(walls, shape, mdp)
+    g_free = g[free]
+    absorbing = bool((moves == len(free)).any())
+    if stopping == "policy":
+        interchangeable = interchangeable_actions(moves, action_probs)
+    start = time.perf_counter()
+
+    def result(values, policy, sweeps):
+        S = len(walls)
+        if return_q:
+            return unpack(values, free, S), unpack(policy, free, S), sweeps, unpack(g_free + gamma * expected, free, S)
+        return unpack(values, free, S), unpack(policy, free, S), sweeps
+
+    def backup(values):
+        expected = move_expected_values(values, moves, action_probs)
+        best, policy = min_over_actions(expected)
+        new_values = np.append(g_free + gamma * best, 0.0)
+        return new_values, policy, expected
+
+    values = np.append(g_free, 0.0)
+    new_values, policy, expected = backup(values)
+    sweeps = 1
+    history = []
+    reported_policy = None
+
+    while True:
+        residual = np.abs(new_values - values).max()
+        policy_changes = None if reported_policy is None else int((policy != reported_policy).sum())
+        reported_policy = policy
+        report_iteration(observer, start, sweeps, residual, policy_changes)
+
+        if stopping == "sup" and residual < epsilon:
+            # Like value_iteration(), return the values from before the last backup
+            return result(values, policy, sweeps)
+
+        if stopping in ("span", "policy"):
+            lo, hi = macqueen_bounds(values[:-1], new_values[:-1], gamma, absorbing)
+            if hi - lo < epsilon:
+                return result(new_values + (lo + hi) / 2, policy, sweeps)
+
+            if stopping == "policy":
+                # W* - W lies in an interval of width (hi - lo) / gamma, so the Q-values
+                # g + gamma * expected of W* are within (hi - lo) of the ones this backup
+                # computed from W. A cell's greedy action is provably optimal once every
+                # other action is worse by more than that. Only actions with the same
+                # outcome distribution are skipped: they are optimal together or not at all.
+                cells = np.arange(len(free))
+                best = expected[policy, cells]
+                runner_up = np.where(interchangeable[policy, :, cells].T, np.inf, expected).min(axis=0)
+                if (gamma * (runner_up - best) > hi - lo).all():
+                    return result(new_values + (lo + hi) / 2, policy, sweeps)
+
+        if sweeps >= max_iterations:
+            return result(new_values, policy, sweeps)
+
+        # Propose the next iterate
+        history.append((values, new_values))
+        history = history[-(memory + 1):]
+        candidate = new_values
+        if acceleration == "anderson" and len(history) > 2:
+            F = np.stack([(Tw - w)[:-1] for w, Tw in history], axis=1)
+            G = np.stack([Tw[:-1] for _, Tw in history], axis=1)
+            dF, dG = np.diff(F, axis=1), np.diff(G, axis=1)
+            weights = np.linalg.lstsq(dF, F[:, -1], rcond=None)[0]
+            candidate = np.append(G[:, -1] - dG @ weights, 0.0)
+
+        candidate_values, candidate_policy, expected = backup(candidate)
+        sweeps += 1
+
+        # Safeguard: reject an accelerated step whose residual is worse than the one
+        # the current Anderson history started from, and restart the history
+        if len(history) == 1:
+            restart_residual = residual
+        if candidate is not new_values and np.abs(candidate_values - candidate).max() > restart_residual:
+            history = history[-1:]
+            restart_residual = residual
+            candidate = new_values
+            candidate_values, candidate_policy, expected = backup(candidate)
+            sweeps += 1
+
+        values, new_values, policy = candidate, candidate_values, candidate_policy
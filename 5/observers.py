@@ -0,0 +1,73 @@
+import csv
+import json
+import time
+from pathlib import Path
+from rich import print
+
+# Every observer is called once per iteration with a dict holding these keys.
+# policy_changes is None for solvers that do not track a policy.
+FIELDS = ["iteration", "residual", "elapsed", "policy_changes"]
+
+def silent(info: dict):
+    """Observer that ignores every iteration."""
+    pass
+
+class ProgressObserver:
+    """
+    Print a one-line progress report every `every` iterations, and at most once
+    per `interval` seconds in between, so long solves stay readable.
+    """
+
+    def __init__(self, every: int = 100, interval: float = 1.0):
+        self.every = every
+        self.interval = interval
+        self.last_print = float('-inf')
+
+    def __call__(self, info: dict):
+        now = time.perf_counter()
+        if info["iteration"] % self.every != 0 and now - self.last_print < self.interval:
+            return
+
+        self.last_print = now
+        changes = "" if info["policy_changes"] is None else f"  policy changes {info['policy_changes']}"
+        print(f"iteration {info['iteration']:>6}  residual {info['residual']:.3e}  {info['elapsed']:.2f}s{changes}")
+
+class LogObserver:
+    """
+    Append one record per iteration to a CSV or NDJSON file.
+
+    The format is taken from the file suffix (.csv, .ndjson or .jsonl) unless given.
+    An existing log is kept and appended to, so repeated or resumed solves (see
+    storage.solve_store) accumulate in one file; a CSV header is only written to an
+    empty file. Use as a context manager, or call close() when the solve is done.
+    """
+
+    def __init__(self, path: str | Path, format: str | None = None):
+        path = Path(path)
+        if format is None:
+            format = "csv" if path.suffix == ".csv" else "ndjson"
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unknown log format: {format}")
+
+        self.format = format
+        self.file = open(path, "a", newline="")
+        if format == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+
+    def __call__(self, info: dict):
+        if self.format == "csv":
+            self.writer.writerow(info)
+        else:
+            self.file.write(json.dumps(info) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
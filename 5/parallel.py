@@ -0,0 +1,89 @@
+import os
+import time
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from grid_mdp import block_backup, report_iteration
+
+# Per-worker views of the shared arrays and cached slab successor tables
+_arrays = {}
+_segments = []
+_successors = {}
+
+def _attach(names: dict, shape: tuple[int, int]):
+    """Pool initializer: map the parent's shared-memory segments into this worker."""
+    for key, (name, dtype) in names.items():
+        segment = shared_memory.SharedMemory(name=name)
+        _segments.append(segment)
+        _arrays[key] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+def _sweep_block(task: tuple) -> float:
+    """Back up one row block from values[source] into values[1 - source]; return its max change."""
+    r0, r1, source, action_probs, gamma = task
+    values = _arrays[f"values_{source}"]
+    target = _arrays[f"values_{1 - source}"]
+
+    # The one-row halos are read straight from the neighbouring blocks' rows of the
+    # source buffer, which no worker writes to during this sweep
+    new_values = block_backup(values, _arrays["g"], _arrays["walls"], (r0, r1), action_probs, gamma, _successors)
+    max_diff = np.abs(new_values - values[r0:r1]).max()
+    target[r0:r1] = new_values
+    return float(max_diff)
+
+def parallel_value_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, workers: int | None = None, block_rows: int | None = None, observer=None) -> tuple[np.ndarray, int]:
+    """
+    Tiled value iteration over a process pool.
+
+    The grid is split into blocks of block_rows rows (by default four per worker)
+    that the workers back up in parallel from shared memory. Sweeps are
+    synchronous: every block of a sweep reads the same source buffer, and the
+    buffers are swapped only once all blocks are done. Each cell therefore gets
+    the same arithmetic as value_iteration(), and the result is identical to it
+    bit for bit, whatever the number of workers or blocks.
+
+    Returns the flat value array and the number of sweeps performed.
+    """
+    m, n = shape
+    workers = workers or os.cpu_count() or 1
+    if block_rows is None:
+        block_rows = max(1, -(-m // (4 * workers)))
+    blocks = [(r0, min(r0 + block_rows, m)) for r0 in range(0, m, block_rows)]
+
+    # Shared copies of the rewards, walls and the two value buffers
+    initial = {
+        "g": np.asarray(g, dtype=np.float64).reshape(m, n),
+        "walls": np.asarray(walls, dtype=bool).reshape(m, n),
+        "values_0": np.where(walls, 0.0, g).reshape(m, n),
+        "values_1": np.zeros((m, n))
+    }
+    segments = {}
+    arrays = {}
+    try:
+        for key, array in initial.items():
+            segments[key] = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            arrays[key] = np.ndarray(array.shape, dtype=array.dtype, buffer=segments[key].buf)
+            arrays[key][:] = array
+        names = {key: (segments[key].name, arrays[key].dtype) for key in segments}
+
+        with Pool(workers, initializer=_attach, initargs=(names, shape)) as pool:
+            start = time.perf_counter()
+            current = 0
+            iteration_count = 0
+            while iteration_count < max_iterations:
+                tasks = [(r0, r1, current, list(action_probs), gamma) for r0, r1 in blocks]
+                max_diff = max(pool.map(_sweep_block, tasks))
+                iteration_count += 1
+                report_iteration(observer, start, iteration_count, max_diff)
+
+                if max_diff < epsilon:
+                    break
+
+                current = 1 - current
+
+        values = arrays[f"values_{current}"].ravel().copy()
+    finally:
+        arrays.clear()
+        for segment in segments.values():
+            segment.close()
+            segment.unlink()
+
+    return values, iteration_count
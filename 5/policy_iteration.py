@@ -1,7 +1,9 @@
 import copy
+import time
 from enum import Enum
 from rich import print
 import numpy as np
+from grid_mdp import GridMDP, report_iteration, encode_grid, to_grid, unpack, greedy_policy, transition_matrices, policy_matrix, evaluate_policy
 
 class Direction(Enum):
     LEFT = 0
@@ -17,17 +19,6 @@ class Direction(Enum):
     def clockwise(self):
         return Direction((self.value + 1) % 4)
 
-def get_next_position(i, j, action, m, n):
-    if action == Direction.LEFT:
-        return i, max(0, j - 1)
-    elif action == Direction.UP:
-        return max(0, i - 1), j
-    elif action == Direction.RIGHT:
-        return i, min(n - 1, j + 1)
-    elif action == Direction.DOWN:
-        return min(m - 1, i + 1), j
-    return i, j
-
 def print_grid(grid: list[list[float]]):
     for row in grid:
         formatted_row = []
@@ -42,6 +33,8 @@ def print_policy(grid: list[list[float]], rewards: list[list[float]], action_pro
     m = len(grid)
     n = len(grid[0])
 
+    successors = GridMDP.from_rewards(rewards, action_probs).successors.tolist()
+
     # Direction arrows for visualization
     direction_arrows = {
         Direction.LEFT: "←",
@@ -67,15 +60,8 @@ def print_policy(grid: list[list[float]], rewards: list[list[float]], action_pro
             for intended_action in Direction:
                 expected_value = 0
 
-                actions = [
-                    intended_action.counterclockwise,
-                    intended_action,
-                    intended_action.clockwise
-                ]
-
-                for k, action in enumerate(actions):
-                    prob = action_probs[k]
-                    next_i, next_j = get_next_position(i, j, action, m, n)
+                for k, prob in enumerate(action_probs):
+                    next_i, next_j = divmod(successors[intended_action.value][k][i * n + j], n)
 
                     next_value = 0 if grid[next_i][next_j] is None else grid[next_i][next_j]
                     expected_value += prob * next_value
@@ -96,42 +82,57 @@ def policy_iteration_algorithm(rewards: list[list[float]], action_probs: list[fl
     m = len(rewards)
     n = len(rewards[0])
 
-    g = []
-    P = [[0] * (m * n) for _ in range(m * n)]
-    for i in range(m):
-        for j in range(n):
-            state_index = i * n + j
-            reward = rewards[i][j] or 0
-            g.append(reward)
-
-            remaining_prob = 1
-            for direction, prob in zip([Direction.RIGHT.counterclockwise, Direction.RIGHT, Direction.RIGHT.clockwise], action_probs):
-                i_1, j_1 = get_next_position(i, j, direction, m, n)
-                next_state_index = i_1 * n + j_1
-                if (i, j) != (i_1, j_1):
-                    P[state_index][next_state_index] += prob
-                    remaining_prob -= prob
-            P[state_index][state_index] += remaining_prob
-
-    P = np.array(P)
-    g = np.array(g)
-
-    I = np.eye(len(P))
-    policy = np.linalg.inv(I - gamma * P) @ g
-    policy = policy.reshape(m, n)
-    
-    policy_list = []
-    for i in range(m):
-        row = []
-        for j in range(n):
-            if rewards[i][j] is not None:
-                row.append(policy[i][j].item())
-            else:
-                row.append(None)
-        policy_list.append(row)
-    
-    return policy_list
+    # Walls are treated as ordinary zero-reward cells here, so compile with no wall mask
+    g, walls = encode_grid(rewards)
+    matrices = transition_matrices(np.zeros_like(walls), (m, n), action_probs)
 
+    # Evaluate the policy that always intends to move right
+    policy = np.full(m * n, Direction.RIGHT.value)
+    P = policy_matrix(matrices, policy)
+
+    values = evaluate_policy(P, g, gamma)
+    
+    return to_grid(values, walls, (m, n))
+
+def policy_iteration(g: np.ndarray, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], gamma: float = 0.9, max_iterations: int = 100, method: str = "auto", observer=None, mdp: GridMDP | None = None) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Policy iteration on an encoded grid: alternate sparse policy evaluation and
+    vectorized greedy improvement until the policy stops changing.
+
+    Each evaluation is warm-started from the previous value vector. The linear
+    systems and greedy steps cover the free cells only (see pack_index), so walls
+    add neither unknowns nor work. The grid is compiled into a GridMDP once, or
+    taken from mdp. Returns the flat value array, the flat policy (Direction
+    values) and the number of improvement steps performed.
+    """
+    mdp = mdp or GridMDP(walls, shape, action_probs)
+    free, successors = mdp.free, mdp.packed_successors
+    matrices = mdp.packed_transition_matrices()
+    g_free = g[free]
+
+    # Start from the greedy policy of the one-step costs
+    values = np.append(g_free, 0.0)
+    policy = greedy_policy(values, successors, action_probs)
+    start = time.perf_counter()
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        P = policy_matrix(matrices, policy)
+        new_values = np.append(evaluate_policy(P, g_free, gamma, method=method, x0=values[:-1]), 0.0)
+        residual = np.abs(new_values - values).max()
+        values = new_values
+
+        new_policy = greedy_policy(values, successors, action_probs, current=policy)
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, residual, int((new_policy != policy).sum()))
+
+        if np.array_equal(new_policy, policy):
+            break
+
+        policy = new_policy
+
+    S = len(walls)
+    return unpack(values, free, S), unpack(policy, free, S), iteration_count
 
 if __name__ == '__main__':
     rewards = [
@@ -153,4 +154,13 @@ if __name__ == '__main__':
     print(optimal_grid)
 
     print("Optimal Policy")
-    print_policy(optimal_grid, rewards, action_probs, gamma)
\ No newline at end of file
+    print_policy(optimal_grid, rewards, action_probs, gamma)
+
+    g, walls = encode_grid(rewards)
+    m, n = len(rewards), len(rewards[0])
+    values, policy, iteration_count = policy_iteration(g, walls, (m, n), action_probs, gamma=gamma)
+    print(f"\nPolicy iteration converged after {iteration_count} iterations")
+    print_grid(to_grid(values, walls, (m, n)))
+
+    print("Optimal Policy")
+    print_policy(to_grid(values, walls, (m, n)), rewards, action_probs, gamma)
\ No newline at end of file
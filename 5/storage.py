@@ -0,0 +1,163 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+from grid_mdp import block_backup, report_iteration
+
+# Files inside a store directory
+META = "meta.json"
+REWARDS = "rewards.f64"
+WALLS = "walls.bool"
+WORKING = ["values_0.f64", "values_1.f64"]
+CHECKPOINT_VALUES = "checkpoint.f64"
+CHECKPOINT = "checkpoint.json"
+
+def _memmap(path: Path, dtype, shape: tuple[int, int], mode: str) -> np.memmap:
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+def _write_json(path: Path, data: dict):
+    # Write to a temporary file and rename, so a crash never leaves half a file
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+def create_store(directory: str | Path, shape: tuple[int, int]) -> tuple[np.memmap, np.memmap]:
+    """
+    Create an on-disk grid in `directory` and return its (rewards, walls) memmaps.
+
+    Both start as zeros (no walls). Fill them in place, block by block if the grid is
+    larger than RAM, then call flush() on each before solving. Any solve state left
+    in the directory by an earlier grid is deleted, and the store gets a new
+    generation id so checkpoints of the earlier grid can never be resumed.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in WORKING + [CHECKPOINT_VALUES, CHECKPOINT]:
+        (directory / name).unlink(missing_ok=True)
+    _write_json(directory / META, {"shape": list(shape), "generation": uuid.uuid4().hex})
+
+    g = _memmap(directory / REWARDS, np.float64, shape, "w+")
+    walls = _memmap(directory / WALLS, np.bool_, shape, "w+")
+    return g, walls
+
+def store_from_rewards(directory: str | Path, rewards: list[list[float]]) -> tuple[np.memmap, np.memmap]:
+    """Create an on-disk grid from a list-of-lists rewards grid with None for walls."""
+    m, n = len(rewards), len(rewards[0])
+    g, walls = create_store(directory, (m, n))
+    for i, row in enumerate(rewards):
+        walls[i] = [cell is None for cell in row]
+        g[i] = [0.0 if cell is None else cell for cell in row]
+    g.flush()
+    walls.flush()
+    return g, walls
+
+def open_store(directory: str | Path) -> tuple[np.memmap, np.memmap, tuple[int, int]]:
+    """Open an existing on-disk grid read-only."""
+    directory = Path(directory)
+    shape = tuple(json.loads((directory / META).read_text())["shape"])
+    g = _memmap(directory / REWARDS, np.float64, shape, "r")
+    walls = _memmap(directory / WALLS, np.bool_, shape, "r")
+    return g, walls, shape
+
+def load_checkpoint(directory: str | Path, problem: dict | None = None) -> tuple[np.memmap, dict] | None:
+    """
+    Return the checkpointed values and their metadata, or None if there is no
+    checkpoint or its metadata disagrees with any entry of problem.
+    """
+    directory = Path(directory)
+    if not (directory / CHECKPOINT).exists():
+        return None
+
+    state = json.loads((directory / CHECKPOINT).read_text())
+    if problem is not None and any(state.get(key) != value for key, value in problem.items()):
+        return None
+    shape = tuple(json.loads((directory / META).read_text())["shape"])
+    values = _memmap(directory / CHECKPOINT_VALUES, np.float64, shape, "r")
+    return values, state
+
+def save_checkpoint(directory: str | Path, values: np.ndarray, state: dict, block_rows: int = 1024):
+    """Copy values into the checkpoint file block by block, then record the state."""
+    directory = Path(directory)
+    tmp = directory / (CHECKPOINT_VALUES + ".tmp")
+    copy = _memmap(tmp, np.float64, values.shape, "w+")
+    for r0 in range(0, values.shape[0], block_rows):
+        copy[r0:r0 + block_rows] = values[r0:r0 + block_rows]
+    copy.flush()
+    del copy
+
+    os.replace(tmp, directory / CHECKPOINT_VALUES)
+    _write_json(directory / CHECKPOINT, state)
+
+def solve_store(directory: str | Path, action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, checkpoint_every: int = 10, block_rows: int = 1024, resume: bool = True, observer=None) -> tuple[np.memmap, int]:
+    """
+    Out-of-core value iteration on an on-disk grid.
+
+    Each sweep streams over blocks of block_rows rows, reading the current values
+    and writing the new ones to memory-mapped files, so only a few blocks are in
+    RAM at a time. Every checkpoint_every sweeps the values are copied to a
+    checkpoint; with resume=True a later call continues from the last checkpoint
+    instead of from the rewards.
+
+    A checkpoint records the store generation (see create_store), the shape, gamma,
+    action_probs and epsilon it was made with. It is only resumed by a solve of the
+    same grid with the same gamma and action_probs; anything else starts over from
+    the rewards. A different epsilon resumes, but re-checks convergence.
+
+    Returns the memory-mapped value grid and the total number of sweeps.
+    """
+    directory = Path(directory)
+    g, walls, shape = open_store(directory)
+    m, n = shape
+    problem = {
+        "generation": json.loads((directory / META).read_text()).get("generation"),
+        "shape": list(shape),
+        "gamma": float(gamma),
+        "action_probs": [float(p) for p in action_probs]
+    }
+
+    buffers = [_memmap(directory / name, np.float64, shape, "w+" if not (directory / name).exists() else "r+") for name in WORKING]
+    current = 0
+
+    checkpoint = load_checkpoint(directory, problem) if resume else None
+    if checkpoint is not None:
+        values, state = checkpoint
+        iteration_count = state["iteration"]
+        converged = state["converged"] and state.get("epsilon") == epsilon
+        for r0 in range(0, m, block_rows):
+            buffers[current][r0:r0 + block_rows] = values[r0:r0 + block_rows]
+        del values
+    else:
+        iteration_count = 0
+        converged = False
+        for r0 in range(0, m, block_rows):
+            buffers[current][r0:r0 + block_rows] = np.where(walls[r0:r0 + block_rows], 0.0, g[r0:r0 + block_rows])
+
+    start = time.perf_counter()
+    successors = {}
+    while not converged and iteration_count < max_iterations:
+        source, target = buffers[current], buffers[1 - current]
+
+        max_diff = 0.0
+        for r0 in range(0, m, block_rows):
+            r1 = min(r0 + block_rows, m)
+            new_values = block_backup(source, g, walls, (r0, r1), action_probs, gamma, successors)
+            max_diff = max(max_diff, np.abs(new_values - source[r0:r1]).max())
+            target[r0:r1] = new_values
+
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff)
+
+        # Like value_iteration(), keep the values from before the converging sweep
+        converged = bool(max_diff < epsilon)
+        if not converged:
+            current = 1 - current
+
+        if converged or iteration_count % checkpoint_every == 0 or iteration_count == max_iterations:
+            buffers[current].flush()
+            state = {"iteration": iteration_count, "converged": converged, "epsilon": epsilon, **problem}
+            save_checkpoint(directory, buffers[current], state, block_rows)
+
+    buffers[current].flush()
+    return buffers[current], iteration_count
@@ -1,6 +1,9 @@
 import copy
+import time
 from enum import Enum
 from rich import print
+import numpy as np
+from grid_mdp import GridMDP, encode_grid, to_grid, successor_table, expected_values, min_over_actions, value_iteration, report_iteration
 
 class Direction(Enum):
     LEFT = 0
@@ -16,16 +19,12 @@ class Direction(Enum):
     def clockwise(self):
         return Direction((self.value + 1) % 4)
 
-def get_next_position(i, j, action, m, n):
-    if action == Direction.LEFT:
-        return i, max(0, j - 1)
-    elif action == Direction.UP:
-        return max(0, i - 1), j
-    elif action == Direction.RIGHT:
-        return i, min(n - 1, j + 1)
-    elif action == Direction.DOWN:
-        return min(m - 1, i + 1), j
-    return i, j
+def to_policy_grid(policy: np.ndarray, walls: np.ndarray, shape: tuple[int, int]) -> list[list[Direction]]:
+    """Convert a flat action array into a grid of Directions with None for walls."""
+    return [
+        [None if action is None else Direction(action) for action in row]
+        for row in to_grid(policy, walls, shape)
+    ]
 
 def print_grid(grid: list[list[float]]):
     for row in grid:
@@ -37,10 +36,18 @@ def print_grid(grid: list[list[float]]):
                 formatted_row.append(round(cell, 2))
         print(formatted_row)
 
-def print_policy(grid: list[list[float]], rewards: list[list[float]], action_probs: list[float], gamma: float):
+def print_policy(grid: list[list[float]], rewards: list[list[float]], action_probs: list[float], gamma: float, policy: list[list[Direction]] | None = None):
+    """
+    Print the greedy policy of a value grid as arrows.
+
+    Pass the policy returned by value_iteration_algorithm(..., return_policy=True)
+    to print it as is; otherwise it is recomputed from the grid.
+    """
     m = len(grid)
     n = len(grid[0])
 
+    successors = GridMDP.from_rewards(rewards, action_probs).successors.tolist()
+
     # Direction arrows for visualization
     direction_arrows = {
         Direction.LEFT: "←",
@@ -59,6 +66,10 @@ def print_policy(grid: list[list[float]], rewards: list[list[float]], action_pro
                 policy_row.append("Wall")
                 continue
 
+            if policy is not None:
+                policy_row.append(direction_arrows[policy[i][j]])
+                continue
+
             best_action = None
             min_expected_value = float('inf')
 
@@ -66,15 +77,8 @@ def print_policy(grid: list[list[float]], rewards: list[list[float]], action_pro
             for intended_action in Direction:
                 expected_value = 0
 
-                actions = [
-                    intended_action.counterclockwise,
-                    intended_action,
-                    intended_action.clockwise
-                ]
-
-                for k, action in enumerate(actions):
-                    prob = action_probs[k]
-                    next_i, next_j = get_next_position(i, j, action, m, n)
+                for k, prob in enumerate(action_probs):
+                    next_i, next_j = divmod(successors[intended_action.value][k][i * n + j], n)
 
                     next_value = 0 if grid[next_i][next_j] is None else grid[next_i][next_j]
                     expected_value += prob * next_value
@@ -91,9 +95,16 @@ def print_policy(grid: list[list[float]], rewards: list[list[float]], action_pro
     for row in policy_grid:
         print(row)
 
-def iteration(current_grid: list[list[float]], rewards: list[list[float]], action_probs: list[float], gamma: float):
+def iteration(current_grid: list[list[float]], rewards: list[list[float]], action_probs: list[float], gamma: float, policy: list[list[Direction]] | None = None, successors: list | None = None):
+    """
+    One Bellman sweep. If a policy grid is passed, the minimizing action of every
+    cell is written into it as well. Pass the successor lists of a compiled GridMDP
+    to reuse them across sweeps.
+    """
     m = len(current_grid)
     n = len(current_grid[0])
+    if successors is None:
+        successors = GridMDP.from_rewards(rewards, action_probs).successors.tolist()
     new_grid = copy.deepcopy(current_grid)
     
     for i in range(m):
@@ -103,43 +114,61 @@ def iteration(current_grid: list[list[float]], rewards: list[list[float]], actio
             if rewards[i][j] is None:
                 continue
 
+            best_action = None
             min_expected_value = float('inf')
 
             # Consider all 4 possible intended actions
             for intended_action in Direction:
                 expected_value = 0
 
-                actions = [
-                    intended_action.counterclockwise,
-                    intended_action,
-                    intended_action.clockwise
-                ]
-
-                for k, action in enumerate(actions):
-                    prob = action_probs[k]
-                    next_i, next_j = get_next_position(i, j, action, m, n)
+                for k, prob in enumerate(action_probs):
+                    next_i, next_j = divmod(successors[intended_action.value][k][i * n + j], n)
 
                     next_value = 0 if current_grid[next_i][next_j] is None else current_grid[next_i][next_j]
                     expected_value += prob * next_value
 
-                min_expected_value = min(min_expected_value, expected_value)
+                if expected_value < min_expected_value:
+                    min_expected_value = expected_value
+                    best_action = intended_action
+
+            if policy is not None:
+                policy[i][j] = best_action
 
             new_grid[i][j] = rewards[i][j] + gamma * min_expected_value
     
     return new_grid
 
-def value_iteration_algorithm(rewards: list[list[float]], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100):
+def value_iteration_algorithm(rewards: list[list[float]], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, backend: str = "python", verbose: bool = False, observer=None, return_policy: bool = False):
+    """
+    Value iteration on a list-of-lists grid.
+
+    verbose=True prints the whole grid every iteration; otherwise nothing is printed
+    and per-iteration telemetry only goes to the observer (see observers.py).
+
+    With return_policy=True a (grid, policy) pair is returned, where policy is a
+    grid of Directions (None for walls) recorded during the last sweep, so it
+    needs no separate pass over the grid.
+    """
     m = len(rewards)
     n = len(rewards[0])
+
+    if backend == "numpy":
+        return numpy_value_iteration(rewards, action_probs, epsilon=epsilon, gamma=gamma, max_iterations=max_iterations, verbose=verbose, observer=observer, return_policy=return_policy)
+    elif backend != "python":
+        raise ValueError(f"Unknown backend: {backend}")
     
     current_grid = copy.deepcopy(rewards)
+    policy = [[None] * n for _ in range(m)]
+    successors = GridMDP.from_rewards(rewards, action_probs).successors.tolist()
+    start = time.perf_counter()
     
     iteration_count = 0
     while iteration_count < max_iterations:
-        print(f'\nW_{iteration_count} (Iteration {iteration_count}):')
-        print_grid(current_grid)
+        if verbose:
+            print(f'\nW_{iteration_count} (Iteration {iteration_count}):')
+            print_grid(current_grid)
         
-        new_grid = iteration(current_grid, rewards, action_probs, gamma)
+        new_grid = iteration(current_grid, rewards, action_probs, gamma, policy if return_policy else None, successors)
 
         # Calculate infinity norm of the difference
         max_diff = 0
@@ -150,36 +179,90 @@ def value_iteration_algorithm(rewards: list[list[float]], action_probs: list[flo
                     max_diff = max(max_diff, diff)
         
         iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff)
         
         if max_diff < epsilon:
-            print(f"\nConverged after {iteration_count} iterations (max_diff: {max_diff:.6f})")
+            if verbose:
+                print(f"\nConverged after {iteration_count} iterations (max_diff: {max_diff:.6f})")
             break
             
         current_grid = new_grid
 
+    if verbose:
+        print(f'\nFinal W_{iteration_count}:')
+        print_grid(current_grid)
+    
+    if return_policy:
+        return current_grid, policy
+    return current_grid
+
+def numpy_value_iteration(rewards: list[list[float]], action_probs: list[float], epsilon: float = 1e-6, gamma: float = 0.9, max_iterations: int = 100, verbose: bool = False, observer=None, return_policy: bool = False):
+    m = len(rewards)
+    n = len(rewards[0])
+
+    # Encode the grid once: flat rewards, wall mask and successor indices
+    g, walls = encode_grid(rewards)
+
+    if not verbose:
+        values, policy, iteration_count = value_iteration(g, walls, (m, n), action_probs, epsilon=epsilon, gamma=gamma, max_iterations=max_iterations, observer=observer)
+        if return_policy:
+            return to_grid(values, walls, (m, n)), to_policy_grid(policy, walls, (m, n))
+        return to_grid(values, walls, (m, n))
+
+    successors = successor_table(m, n)
+    current_values = g.copy()
+    start = time.perf_counter()
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        print(f'\nW_{iteration_count} (Iteration {iteration_count}):')
+        print_grid(to_grid(current_values, walls, (m, n)))
+
+        expected = expected_values(current_values, successors, action_probs)
+        new_values = g + gamma * expected.min(axis=0)
+        new_values[walls] = 0.0
+
+        # Calculate infinity norm of the difference
+        max_diff = np.abs(new_values - current_values).max()
+
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff)
+
+        if max_diff < epsilon:
+            print(f"\nConverged after {iteration_count} iterations (max_diff: {max_diff:.6f})")
+            break
+
+        current_values = new_values
+
+    current_grid = to_grid(current_values, walls, (m, n))
+
     print(f'\nFinal W_{iteration_count}:')
     print_grid(current_grid)
-    
+
+    if return_policy:
+        _, policy = min_over_actions(expected)
+        return current_grid, to_policy_grid(policy, walls, (m, n))
     return current_grid
 
-rewards = [
-    [0, 0, 0, -1],
-    [0, None, 0, 100],
-    [0, 0, 0, 0]
-]
+if __name__ == '__main__':
+    rewards = [
+        [0, 0, 0, -1],
+        [0, None, 0, 100],
+        [0, 0, 0, 0]
+    ]
     
-action_probs = [0.1, 0.8, 0.1]  # [counterclockwise, intended, clockwise]
-gamma = 0.9
-epsilon = 1e-7
+    action_probs = [0.1, 0.8, 0.1]  # [counterclockwise, intended, clockwise]
+    gamma = 0.9
+    epsilon = 1e-7
 
-print("Rewards grid (g(x)):")
-print_grid(rewards)
+    print("Rewards grid (g(x)):")
+    print_grid(rewards)
 
-print(f"\nAction probabilities: {action_probs}")
-print(f"Gamma (discount factor): {gamma}")
-print(f"Epsilon: {epsilon}")
+    print(f"\nAction probabilities: {action_probs}")
+    print(f"Gamma (discount factor): {gamma}")
+    print(f"Epsilon: {epsilon}")
 
-optimal_grid = value_iteration_algorithm(rewards, action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100)
+    optimal_grid, optimal_policy = value_iteration_algorithm(rewards, action_probs, epsilon=epsilon, gamma=gamma, max_iterations=100, verbose=True, return_policy=True)
 
-print("Optimal Policy")
-print_policy(optimal_grid, rewards, action_probs, gamma)
\ No newline at end of file
+    print("Optimal Policy")
+    print_policy(optimal_grid, rewards, action_probs, gamma, optimal_policy)
\ No newline at end of file
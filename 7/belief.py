@@ -0,0 +1,384 @@
+from typing import Iterable, Iterator
+import numpy as np
+import scipy.sparse as sp
+import grid_mdp_path  # puts 5/ on the import path
+from grid_mdp import GridMDP, encode_grid, to_grid
+
+# Action indices follow grid_mdp's clockwise order, so a slip to the "left" or "right"
+# of an action is its counterclockwise or clockwise neighbour, matching
+# action_probs = [left, intended, right]
+ACTIONS = {'left': 0, 'up': 1, 'right': 2, 'down': 3}
+
+def row_entries(matrix: sp.csr_matrix, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Positions in matrix.data/indices of the given rows' entries, concatenated, and each row's count."""
+    starts = matrix.indptr[rows]
+    lengths = matrix.indptr[rows + 1] - starts
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum()), lengths
+
+def rows_dot(matrix: sp.csr_matrix, rows: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """
+    (matrix[rows] @ vector) for a handful of rows, read straight from the CSR arrays
+    without building the row slice.
+    """
+    entries, lengths = row_entries(matrix, rows)
+    products = matrix.data[entries] * vector[matrix.indices[entries]]
+    return np.bincount(np.repeat(np.arange(len(rows)), lengths), products, minlength=len(rows))
+
+def sparse_lookup(cells: np.ndarray, values: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Values of a sparse belief (sorted cells, values) at the query cells, 0 where it has no mass."""
+    if len(cells) == 0:
+        return np.zeros(len(query))
+    position = np.minimum(np.searchsorted(cells, query), len(cells) - 1)
+    return np.where(cells[position] == query, values[position], 0.0)
+
+class GridBeliefModel:
+    """
+    The grid localization POMDP of pomdp.py and q1.py, compiled once into arrays.
+
+    Moves are blocked by walls and boundaries, and slip to the left or right of the
+    intended direction with action_probs[0] and action_probs[2]. The sensor reports
+    the true cell with probability hit and each of its neighbours with probability
+    near; a cell with fewer than four neighbours adds the missing near mass to hit:
+        observation_probs = (hit, near)
+
+    Beliefs are flat arrays over the m * n cells and are 0 at walls. The optional
+    stage costs g are only needed for planning (see point_based.py).
+    """
+
+    def __init__(self, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], observation_probs: tuple[float, float] = (0.6, 0.1), g: np.ndarray | None = None):
+        self.mdp = GridMDP(walls, shape, action_probs, g=g, blocking=True)
+        self.shape = self.mdp.shape
+        self.walls = self.mdp.walls
+        self.hit, self.near = observation_probs
+
+        # transitions[a][x', x] = P(x | a, x'), with empty rows at walls, and its transpose
+        # arrivals[a][x, x'] for reading off which previous states lead into x
+        self.transitions = self.mdp.transition_matrices()
+        self.arrivals = [P.T.tocsr() for P in self.transitions]
+
+        # A move that is not blocked leads to one of the cell's valid neighbours
+        self.neighbours = self.mdp.moves
+        self.valid_neighbours = self.neighbours != np.arange(len(self.walls))
+
+        # observations[y, x] = P(y | x), and normalizers[a][y, x'] = sum_x P(y|x) P(x|a,x'),
+        # the per-x' denominator of update(); both are built once and reused every step
+        self.observations = self.observation_matrix()
+        self.normalizers = [(self.observations @ P.T).tocsr() for P in self.transitions]
+
+        # Scratch vector for update_support(), all zeros between calls
+        self._weights = np.zeros(len(self.walls))
+
+    @classmethod
+    def from_grid(cls, grid: list[list[float]], action_probs: list[float], observation_probs: tuple[float, float] = (0.6, 0.1)) -> "GridBeliefModel":
+        """Compile a list-of-lists grid with None for walls; its values are the stage costs."""
+        g, walls = encode_grid(grid)
+        return cls(walls, (len(grid), len(grid[0])), action_probs, observation_probs, g=g)
+
+    def action_index(self, action: str | int) -> int:
+        return ACTIONS[action] if isinstance(action, str) else action
+
+    def observation_matrix(self) -> sp.csr_matrix:
+        """Sparse (S x S) sensor model, observations[y, x] = P(y | x); rows of walls are empty."""
+        S = len(self.walls)
+        free = self.mdp.free
+        valid = self.valid_neighbours[:, free]
+
+        # The true cell, with the mass of any missing neighbours added to hit
+        rows = [free]
+        cols = [free]
+        data = [self.hit + self.near * (len(valid) - valid.sum(axis=0))]
+
+        # Each valid neighbour of the observed cell
+        for d in range(len(valid)):
+            rows.append(free[valid[d]])
+            cols.append(self.neighbours[d, free[valid[d]]])
+            data.append(np.full(valid[d].sum(), self.near))
+
+        return sp.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(S, S))
+
+    def observation_vector(self, y_obs: tuple[int, int]) -> np.ndarray:
+        """P(y_obs | x) for every cell x."""
+        return self.observations[self.mdp.index(y_obs)].toarray().ravel()
+
+    def update(self, belief: np.ndarray, action: str | int, y_obs: tuple[int, int]) -> np.ndarray:
+        """
+        One belief update, as calculate_new_belief() in pomdp.py:
+
+            p_k(x) = sum_x' [P(y|x) P(x|u,x') / sum_x~ P(y|x~) P(x~|u,x')] p_{k-1}(x')
+
+        The denominators are a precomputed row of normalizers and the outer sum is a
+        sparse product, instead of a loop over cells cubed.
+        """
+        cells, values = self.update_support(belief, action, y_obs)
+        new_belief = np.zeros(len(belief))
+        new_belief[cells] = values
+        return new_belief
+
+    def update_support(self, belief: np.ndarray, action: str | int, y_obs: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        update() restricted to the cells y_obs can be observed from, the only ones
+        where the new belief can be nonzero. Returns (cells, values). Only a handful of
+        table rows are read, so the cost does not grow with the map.
+        """
+        a = self.action_index(action)
+        y = self.mdp.index(y_obs)
+
+        # Only previous states that can produce y have a nonzero denominator
+        normalizers = self.normalizers[a]
+        start, end = normalizers.indptr[y], normalizers.indptr[y + 1]
+        previous = normalizers.indices[start:end]
+        self._weights[previous] = belief[previous] / normalizers.data[start:end]
+
+        start, end = self.observations.indptr[y], self.observations.indptr[y + 1]
+        cells = self.observations.indices[start:end]
+        values = self.observations.data[start:end] * rows_dot(self.arrivals[a], cells, self._weights)
+
+        self._weights[previous] = 0.0
+        return cells, values
+
+    def forward_update_support(self, belief: np.ndarray, action: str | int, y_obs: tuple[int, int]) -> tuple[np.ndarray, np.ndarray, float]:
+        """
+        One step of the scaled forward (Bayes) filter on the support of y_obs:
+
+            p_k(x) = P(y|x) sum_x' P(x|u,x') p_{k-1}(x') / c_k
+
+        Unlike update(), which normalizes per previous state, the scale c_k is one
+        number, P(y_k | y_1..k-1), so log(c_k) summed over a sequence is its
+        log-likelihood. Returns (cells, values, log(c_k)); an impossible observation
+        gives zero values and -inf.
+        """
+        a = self.action_index(action)
+        y = self.mdp.index(y_obs)
+
+        start, end = self.observations.indptr[y], self.observations.indptr[y + 1]
+        cells = self.observations.indices[start:end]
+        values = self.observations.data[start:end] * rows_dot(self.arrivals[a], cells, belief)
+
+        scale = values.sum()
+        if scale <= 0:
+            return cells, np.zeros(len(cells)), -np.inf
+        return cells, values / scale, float(np.log(scale))
+
+    def forward_update(self, belief: np.ndarray, action: str | int, y_obs: tuple[int, int]) -> tuple[np.ndarray, float]:
+        """Dense forward_update_support(): the new belief and its log-normalizer."""
+        cells, values, log_scale = self.forward_update_support(belief, action, y_obs)
+        new_belief = np.zeros(len(belief))
+        new_belief[cells] = values
+        return new_belief, log_scale
+
+    def log_likelihood(self, belief: np.ndarray, steps: Iterable[tuple[str | int, tuple[int, int]]]) -> float:
+        """
+        log P(y_1..y_K | u_1..u_K) of a whole (action, y_obs) sequence from the prior
+        belief, in one streaming pass. Only the support of the running belief is kept,
+        so long sequences neither underflow nor grow in cost or memory.
+        """
+        current = np.array(belief, dtype=np.float64)
+        support = np.flatnonzero(current)
+        total = 0.0
+        for action, y_obs in steps:
+            cells, values, log_scale = self.forward_update_support(current, action, y_obs)
+            total += log_scale
+            if log_scale == -np.inf:
+                break
+            current[support] = 0.0
+            current[cells] = values
+            support = cells
+        return total
+
+    def sparse(self, belief: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Sparse form (cells, values) of a flat belief: its nonzero cells, sorted, and their mass."""
+        cells = np.flatnonzero(belief)
+        return cells, np.asarray(belief)[cells]
+
+    def dense(self, cells: np.ndarray, values: np.ndarray) -> np.ndarray:
+        belief = np.zeros(len(self.walls))
+        belief[cells] = values
+        return belief
+
+    def predict_sparse(self, cells: np.ndarray, values: np.ndarray, action: str | int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Motion step of a sparse belief, sum_x' P(x|u,x') p(x'), expanding only the
+        one-step successors of its cells.
+        """
+        successors = self.mdp.successors[self.action_index(action)][:, cells]
+        targets, inverse = np.unique(successors, return_inverse=True)
+        mass = (self.mdp.probs[:, None] * values).ravel()
+        return targets, np.bincount(inverse.ravel(), mass, minlength=len(targets))
+
+    def observe_sparse(self, cells: np.ndarray, values: np.ndarray, y_obs: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """Multiply a sparse belief by P(y_obs | x), unnormalized, keeping the cells left with mass."""
+        y = self.mdp.index(y_obs)
+        start, end = self.observations.indptr[y], self.observations.indptr[y + 1]
+        observed = self.observations.indices[start:end]
+        new_values = self.observations.data[start:end] * sparse_lookup(cells, values, observed)
+        keep = new_values > 0
+        return observed[keep], new_values[keep]
+
+    def update_sparse(self, cells: np.ndarray, values: np.ndarray, action: str | int, y_obs: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """update() on a sparse belief; the cost depends on its support, not on the map."""
+        a = self.action_index(action)
+        y = self.mdp.index(y_obs)
+
+        # The per-x' weights p(x') / sum_x P(y|x) P(x|u,x'), then the same motion and sensor steps
+        normalizers = self.normalizers[a]
+        start, end = normalizers.indptr[y], normalizers.indptr[y + 1]
+        previous = normalizers.indices[start:end]
+        weights = sparse_lookup(cells, values, previous) / normalizers.data[start:end]
+        return self.observe_sparse(*self.predict_sparse(previous, weights, a), y_obs)
+
+    def forward_update_sparse(self, cells: np.ndarray, values: np.ndarray, action: str | int, y_obs: tuple[int, int]) -> tuple[np.ndarray, np.ndarray, float]:
+        """forward_update() on a sparse belief: (cells, values, log-normalizer)."""
+        cells, values = self.observe_sparse(*self.predict_sparse(cells, values, action), y_obs)
+        scale = values.sum()
+        if scale <= 0:
+            return cells, values, -np.inf
+        return cells, values / scale, float(np.log(scale))
+
+    def update_batch(self, beliefs: np.ndarray, actions, y_obs, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        update() for a (batch, S) matrix of independent beliefs, row b taking
+        actions[b] and y_obs[b]. y_obs is a sequence of cells or a (batch, 2) array.
+        The new beliefs are written into out if it is given, which must not be beliefs.
+
+        Rows are grouped by action, and each group is updated with one product of
+        sparse per-row weights and the action's transition matrix.
+        """
+        beliefs = np.asarray(beliefs, dtype=np.float64)
+        actions = np.asarray(actions)
+        if actions.dtype.kind in "US":
+            actions = np.array([ACTIONS[action] for action in actions])
+        y_obs = np.asarray(y_obs).reshape(-1, 2)
+        ys = y_obs[:, 0] * self.shape[1] + y_obs[:, 1]
+
+        if out is None:
+            new_beliefs = np.zeros(beliefs.shape)
+        else:
+            new_beliefs = out
+            new_beliefs.fill(0.0)
+        for a in np.unique(actions):
+            rows = np.flatnonzero(actions == a)
+
+            # weights[b, x'] = p_b(x') / sum_x P(y_b|x) P(x|a,x'), where that is nonzero
+            weights = self.normalizers[a][ys[rows]]
+            group_rows = np.repeat(rows, np.diff(weights.indptr))
+            weights.data = beliefs[group_rows, weights.indices] / weights.data
+
+            # Only the few cells each row's observation can come from are written
+            predicted = weights @ self.transitions[a]
+            group = self.observations[ys[rows]].multiply(predicted).tocoo()
+            new_beliefs[rows[group.row], group.col] = group.data
+        return new_beliefs
+
+    def belief_vector(self, belief_grid: list[list[float]]) -> np.ndarray:
+        """Flatten a list-of-lists belief grid with None for walls."""
+        return encode_grid(belief_grid)[0]
+
+    def belief_grid(self, belief: np.ndarray) -> list[list[float]]:
+        """Convert a flat belief back into a list-of-lists grid with None for walls."""
+        return to_grid(belief, self.walls, self.shape)
+
+class BeliefTracker:
+    """
+    Runs the scaled forward (Bayes) filter of GridBeliefModel over a stream of
+    (action, y_obs) pairs, so each belief is the posterior P(x_k | y_1..k).
+
+    The last lag + 1 beliefs live in a preallocated ring of buffers, and each step
+    writes only the cells the new belief can be nonzero on (see
+    forward_update_support), so a step costs the same on any map and memory does not
+    grow with the stream.
+
+    With lag > 0 the tracker also smooths: once step k is filtered, the belief of
+    step k - lag is reweighted by the likelihood of the lag observations after it,
+
+        beta(x) = sum_x1 P(x1|u,x) P(y|x1) beta'(x1),   starting from beta = 1,
+
+    run backwards over the window. Filtered posterior times beta is the fixed-lag
+    posterior, which only holds for the Bayes filter: update() normalizes per
+    previous state and would not combine with beta.
+    """
+
+    def __init__(self, model: GridBeliefModel, belief: np.ndarray, lag: int = 0):
+        self.model = model
+        self.lag = lag
+        self.steps = 0
+
+        S = len(model.walls)
+        self._beliefs = np.zeros((lag + 1, S))
+        self._beliefs[0] = belief
+        self._supports = [np.flatnonzero(self._beliefs[0])] + [np.empty(0, dtype=np.intp)] * lag
+        self._inputs = [None] * (lag + 1)
+        self._smoothed = np.zeros(S)
+        self._smoothed_support = self._supports[0]
+        self._weighted = np.zeros(S)
+
+    @property
+    def belief(self) -> np.ndarray:
+        """The current filtered belief. This is a view that the next step overwrites."""
+        return self._beliefs[self.steps % (self.lag + 1)]
+
+    def step(self, action: str | int, y_obs: tuple[int, int]) -> np.ndarray:
+        """Filter one (action, y_obs) pair and return the new belief (see belief)."""
+        cells, values, _ = self.model.forward_update_support(self.belief, action, y_obs)
+
+        # Clear only what the slot's old belief occupied before writing the new one
+        self.steps += 1
+        slot = self.steps % (self.lag + 1)
+        self._beliefs[slot, self._supports[slot]] = 0.0
+        self._beliefs[slot, cells] = values
+        self._supports[slot] = cells
+        self._inputs[slot] = (self.model.action_index(action), self.model.mdp.index(y_obs))
+        return self._beliefs[slot]
+
+    def smoothed(self, lag: int | None = None) -> np.ndarray:
+        """
+        Belief after step steps - lag given every observation up to now, normalized.
+        lag defaults to the tracker's own and is capped by the steps seen so far.
+        This is a view that the next call overwrites.
+
+        beta is only needed where the beliefs in the window are nonzero, so the
+        backward pass also reads a handful of table rows per step.
+        """
+        lag = min(self.lag if lag is None else lag, self.lag, self.steps)
+        observations = self.model.observations
+
+        # Backwards over the window, from the newest step to the one being smoothed
+        beta = 1.0
+        for k in range(self.steps, self.steps - lag, -1):
+            slot = k % (self.lag + 1)
+            a, y = self._inputs[slot]
+            cells = self._supports[slot]
+            self._weighted[cells] = observations.data[observations.indptr[y]:observations.indptr[y + 1]] * beta
+            beta = rows_dot(self.model.transitions[a], self._supports[(k - 1) % (self.lag + 1)], self._weighted)
+            self._weighted[cells] = 0.0
+
+        slot = (self.steps - lag) % (self.lag + 1)
+        cells = self._supports[slot]
+        values = self._beliefs[slot, cells] * beta
+        total = values.sum()
+
+        self._smoothed[self._smoothed_support] = 0.0
+        self._smoothed[cells] = values / total if total > 0 else values
+        self._smoothed_support = cells
+        return self._smoothed
+
+    def track(self, steps: Iterable[tuple[str | int, tuple[int, int]]]) -> Iterator[np.ndarray]:
+        """
+        Lazily filter a stream of (action, y_obs) pairs, yielding each new belief.
+        The yielded arrays are reused buffers; copy any that should be kept.
+        """
+        for action, y_obs in steps:
+            yield self.step(action, y_obs)
+
+    def track_smoothed(self, steps: Iterable[tuple[str | int, tuple[int, int]]]) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Fixed-lag smoothing of a stream: yields (k, belief after step k) as soon as
+        lag later steps have been seen, then flushes the last steps with the shorter
+        windows left once the stream ends. Steps count from 1, after the prior.
+        The yielded arrays are reused buffers; copy any that should be kept.
+        """
+        for action, y_obs in steps:
+            self.step(action, y_obs)
+            if self.steps > self.lag:
+                yield self.steps - self.lag, self.smoothed()
+        for k in range(max(1, self.steps - self.lag + 1), self.steps + 1):
+            yield k, self.smoothed(self.steps - k)
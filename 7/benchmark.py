@@ -0,0 +1,204 @@
+import time
+import numpy as np
+from rich import print
+from belief import BeliefTracker, GridBeliefModel
+from point_based import sample_beliefs, point_based_value_iteration
+from controllers import fib_policy, qmdp_policy
+from particles import ParticleFilter
+
+def random_walls(m: int, n: int, wall_fraction: float = 0.2, seed: int = 0) -> np.ndarray:
+    """Flat wall mask with scattered walls."""
+    rng = np.random.default_rng(seed)
+    return rng.random(m * n, dtype=np.float32) < wall_fraction
+
+def random_belief(walls: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Normalized random belief over the free cells."""
+    rng = np.random.default_rng(seed)
+    belief = np.where(walls, 0.0, rng.random(len(walls)))
+    return belief / belief.sum()
+
+def random_observation(walls: np.ndarray, shape: tuple[int, int], seed: int = 0) -> tuple[int, int]:
+    rng = np.random.default_rng(seed)
+    return divmod(int(rng.choice(np.flatnonzero(~walls))), shape[1])
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_belief_update(sizes: list[int], action_probs: list[float], repeats: int = 20):
+    print("\nVectorized belief update")
+    print(f"{'map':<12} {'cells':<10} {'build':<10} {'update':<10}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        model, build_time = timed(GridBeliefModel, walls, (size, size), action_probs)
+        belief = random_belief(walls)
+        y_obs = random_observation(walls, (size, size))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.update(belief, "up", y_obs)
+        update_time = (time.perf_counter() - start) / repeats
+        print(f"{f'{size}x{size}':<12} {size * size:<10} {build_time:<10.3f} {update_time * 1000:<8.2f}ms")
+
+def bench_batch_update(size: int, action_probs: list[float], batches: list[int]):
+    print(f"\nBatched belief update, {size}x{size} map")
+    print(f"{'batch':<10} {'loop':<12} {'batched':<12} {'speedup':<8}")
+    print("(batched updates write into a preallocated buffer, as a tracking loop would)")
+
+    walls = random_walls(size, size)
+    model = GridBeliefModel(walls, (size, size), action_probs)
+    rng = np.random.default_rng(0)
+
+    for batch in batches:
+        beliefs = np.array([random_belief(walls, seed) for seed in range(batch)])
+        actions = rng.integers(0, 4, batch)
+        y_obs = [random_observation(walls, (size, size), seed) for seed in range(batch)]
+
+        loop, loop_time = timed(lambda: [model.update(*row) for row in zip(beliefs, actions, y_obs)])
+        batched = np.empty_like(beliefs)
+        model.update_batch(beliefs, actions, y_obs, out=batched)
+        _, batch_time = timed(model.update_batch, beliefs, actions, y_obs, out=batched)
+        assert np.allclose(batched, loop, rtol=1e-12, atol=0.0)
+        print(f"{batch:<10} {loop_time * 1000:<10.1f}ms {batch_time * 1000:<10.1f}ms {loop_time / batch_time:<8.1f}")
+
+def bench_sparse_prediction(sizes: list[int], action_probs: list[float], steps: int = 20):
+    print(f"\nDead reckoning from a known cell, {steps} motion steps")
+    print(f"{'map':<12} {'cells':<10} {'support':<10} {'dense':<12} {'sparse':<12}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        model = GridBeliefModel(walls, (size, size), action_probs)
+        belief = np.zeros(size * size)
+        belief[model.mdp.free[len(model.mdp.free) // 2]] = 1.0
+        actions = np.random.default_rng(0).integers(0, 4, steps)
+
+        def dense(belief):
+            for action in actions:
+                belief = model.transitions[action].T @ belief
+            return belief
+
+        def sparse(cells, values):
+            for action in actions:
+                cells, values = model.predict_sparse(cells, values, action)
+            return cells, values
+
+        dense_belief, dense_time = timed(dense, belief)
+        (cells, values), sparse_time = timed(sparse, *model.sparse(belief))
+        assert np.allclose(model.dense(cells, values), dense_belief, rtol=1e-12, atol=1e-15)
+        print(f"{f'{size}x{size}':<12} {size * size:<10} {len(cells):<10} {dense_time * 1000:<10.2f}ms {sparse_time * 1000:<10.2f}ms")
+
+def bench_point_based(sizes: list[int], belief_counts: list[int], action_probs: list[float], gamma: float = 0.95, max_iterations: int = 50):
+    print(f"\nPoint-based value iteration, {max_iterations} iterations at most")
+    print(f"{'map':<10} {'beliefs':<10} {'sample':<10} {'per iter':<12} {'iters':<8} {'vectors':<8}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        g = np.random.default_rng(0).random(size * size)
+        model = GridBeliefModel(walls, (size, size), action_probs, g=g)
+        prior = np.where(walls, 0.0, 1.0) / (~walls).sum()
+
+        for count in belief_counts:
+            beliefs, sample_time = timed(sample_beliefs, model, prior, count)
+            (policy, iterations), solve_time = timed(point_based_value_iteration, model, beliefs, gamma=gamma, max_iterations=max_iterations)
+            print(f"{f'{size}x{size}':<10} {beliefs.shape[0]:<10} {sample_time:<10.2f} {solve_time / iterations * 1000:<10.1f}ms {iterations:<8} {len(policy.alphas):<8}")
+
+def bench_controllers(sizes: list[int], fib_sizes: list[int], action_probs: list[float], gamma: float = 0.95, decisions: int = 1000):
+    print(f"\nQMDP and FIB controllers, decision latency over {decisions} beliefs")
+    print(f"{'map':<12} {'controller':<12} {'solve':<10} {'dense':<12} {'sparse':<12}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        g = np.random.default_rng(0).random(size * size)
+        model = GridBeliefModel(walls, (size, size), action_probs, g=g)
+        belief = random_belief(walls)
+        # A localized belief, as after a few sensor readings
+        cells, values = model.observe_sparse(*model.sparse(belief), random_observation(walls, (size, size)))
+        values = values / values.sum()
+
+        builders = [("QMDP", qmdp_policy)] + ([("FIB", fib_policy)] if size in fib_sizes else [])
+        for name, build in builders:
+            policy, solve_time = timed(build, model, gamma)
+            _, dense_time = timed(lambda: [policy.action(belief) for _ in range(decisions)])
+            _, sparse_time = timed(lambda: [policy.action_sparse(cells, values) for _ in range(decisions)])
+            print(f"{f'{size}x{size}':<12} {name:<12} {solve_time:<10.2f} {dense_time / decisions * 1e6:<10.1f}us {sparse_time / decisions * 1e6:<10.1f}us")
+
+def bench_particle_filter(sizes: list[int], particle_counts: list[int], action_probs: list[float], steps: int = 100):
+    print(f"\nParticle filter from a known start, fixed particle count, {steps} steps")
+    print(f"{'map':<14} {'cells':<12} {'particles':<10} {'per step':<12} {'memory':<10}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        for count in particle_counts:
+            particles = ParticleFilter(walls, (size, size), action_probs, n_particles=count, target_ess=count, min_particles=count, max_particles=count)
+            rng = np.random.default_rng(0)
+
+            # A robot moving at random: slip, move, then read its cell or a neighbour
+            x = int(particles.sample_free(1)[0])
+            log = []
+            for _ in range(steps):
+                action = int(rng.integers(0, 4))
+                x = int(particles.move(np.array([x]), particles.outcomes[action, [rng.choice(3, p=action_probs)]])[0])
+                neighbours = particles.move(np.full(4, x), np.arange(4))
+                reading = rng.choice(5, p=[particles.near] * 4 + [particles.hit])
+                log.append((action, divmod(int(neighbours[reading]) if reading < 4 else x, size)))
+            particles.reset(cells=[log[0][1][0] * size + log[0][1][1]])
+
+            _, elapsed = timed(lambda: [particles.update(action, y_obs) for action, y_obs in log[1:]])
+            memory = particles.particles.nbytes + particles.weights.nbytes
+            print(f"{f'{size}x{size}':<14} {size * size:<12} {count:<10} {elapsed / (steps - 1) * 1000:<10.2f}ms {memory / 1e6:<8.1f}MB")
+
+def simulated_log(model: GridBeliefModel, steps: int, seed: int = 0):
+    """Lazily simulate (action, y_obs) pairs of a robot moving at random."""
+    rng = np.random.default_rng(seed)
+    x = int(rng.choice(model.mdp.free))
+    observations = model.observations.tocsc()
+    for _ in range(steps):
+        action = int(rng.integers(model.mdp.n_actions))
+        x = model.mdp.step(x, action, rng)
+        start, end = observations.indptr[x], observations.indptr[x + 1]
+        y = rng.choice(observations.indices[start:end], p=observations.data[start:end])
+        yield action, model.mdp.cell(y)
+
+def bench_tracker(sizes: list[int], action_probs: list[float], steps: int = 20000, lags: list[int] = [0, 5]):
+    print(f"\nStreaming belief tracker, {steps} steps")
+    print(f"{'map':<12} {'cells':<10} {'lag':<6} {'per step':<10}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        model = GridBeliefModel(walls, (size, size), action_probs)
+        # Start from a known cell, as in a localization log with a known start
+        prior = np.zeros(size * size)
+        prior[model.mdp.free[0]] = 1.0
+        log = list(simulated_log(model, steps))
+
+        for lag in lags:
+            tracker = BeliefTracker(model, prior, lag)
+            _, elapsed = timed(lambda: sum(1 for _ in tracker.track_smoothed(log)))
+            print(f"{f'{size}x{size}':<12} {size * size:<10} {lag:<6} {elapsed / steps * 1e6:<8.1f}us")
+
+def bench_log_likelihood(sizes: list[int], action_probs: list[float], steps: int = 100000):
+    print(f"\nSequence log-likelihood, {steps} steps")
+    print(f"{'map':<12} {'cells':<10} {'log-likelihood':<16} {'per step':<10}")
+
+    for size in sizes:
+        walls = random_walls(size, size)
+        model = GridBeliefModel(walls, (size, size), action_probs)
+        prior = np.where(walls, 0.0, 1.0) / (~walls).sum()
+        log = list(simulated_log(model, steps))
+
+        log_likelihood, elapsed = timed(model.log_likelihood, prior, log)
+        print(f"{f'{size}x{size}':<12} {size * size:<10} {log_likelihood:<16.1f} {elapsed / steps * 1e6:<8.1f}us")
+
+if __name__ == '__main__':
+    action_probs = [.1, .8, .1]
+
+    bench_belief_update([10, 100, 316, 1000], action_probs)
+    bench_tracker([10, 100, 1000], action_probs)
+    bench_log_likelihood([10, 1000], action_probs)
+    bench_sparse_prediction([100, 316, 1000], action_probs)
+    bench_batch_update(50, action_probs, [10, 100, 1000, 10000])
+    bench_point_based([5, 10, 20, 40], [100, 300, 1000], action_probs)
+    bench_controllers([10, 100, 316, 1000], [10, 100, 316], action_probs)
+    bench_particle_filter([100, 1000, 10000], [1000, 10000, 100000], action_probs)
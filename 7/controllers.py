@@ -0,0 +1,100 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+import grid_mdp_path  # puts 5/ on the import path
+from belief import GridBeliefModel, row_entries
+from point_based import AlphaVectorPolicy
+from grid_mdp import expected_values, report_iteration
+
+def qmdp_q_values(model: GridBeliefModel, gamma: float = 0.95, epsilon: float = 1e-6, max_iterations: int = 1000, observer=None) -> tuple[np.ndarray, int]:
+    """
+    Q-values of the fully observable grid MDP, shape (A, S), by value iteration on
+    the model's packed blocking successor table (free cells only):
+
+        Q(u, x) = g(x) + gamma sum_x' P(x'|u,x) V(x'),   V = min_u Q(u, .)
+
+    Returns the Q-values, 0 at walls, and the number of sweeps performed.
+    """
+    mdp = model.mdp
+    g_free = mdp.g[mdp.free]
+    values = np.append(g_free, 0.0)
+    start = time.perf_counter()
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        new_values = np.append(g_free + gamma * expected_values(values, mdp.packed_successors, mdp.probs).min(axis=0), 0.0)
+        max_diff = np.abs(new_values - values).max()
+        values = new_values
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff)
+
+        if max_diff < epsilon:
+            break
+
+    q_values = mdp.unpack(g_free + gamma * expected_values(values, mdp.packed_successors, mdp.probs))
+    return q_values, iteration_count
+
+def fib_q_values(model: GridBeliefModel, gamma: float = 0.95, epsilon: float = 1e-6, max_iterations: int = 1000, observer=None) -> tuple[np.ndarray, int]:
+    """
+    Fast informed bound Q-values, shape (A, S):
+
+        Q(u, x) = g(x) + gamma sum_y min_u' sum_x' P(x'|u,x) P(y|x') Q(u', x')
+
+    Unlike QMDP, the next action may only depend on the reading, not on the next
+    cell, so the bound accounts for the sensor. For every action the (cell,
+    reading) pairs with their joint weights over x' are compiled into one sparse
+    matrix, and each iteration is one product per action. Iterations start from
+    qmdp_q_values().
+
+    Returns the Q-values and the number of iterations performed.
+    """
+    mdp = model.mdp
+    S = len(mdp.walls)
+    readings = model.observations.tocsc()
+
+    # joints[u][(x, y), x'] = P(x'|u,x) P(y|x'), and pair_cells[u] the x of every row
+    joints, pair_cells = [], []
+    for P in model.transitions:
+        P = P.tocoo()
+        entries, lengths = row_entries(readings, P.col)
+        cells = np.repeat(P.row.astype(np.int64), lengths)
+        pairs, pair_index = np.unique(cells * S + readings.indices[entries], return_inverse=True)
+        weights = np.repeat(P.data, lengths) * readings.data[entries]
+        joints.append(sp.csr_matrix((weights, (pair_index.ravel(), np.repeat(P.col, lengths))), shape=(len(pairs), S)))
+        pair_cells.append(pairs // S)
+
+    q_values, _ = qmdp_q_values(model, gamma, epsilon, max_iterations)
+    start = time.perf_counter()
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        new_q_values = np.empty_like(q_values)
+        for u, (joint, cells) in enumerate(zip(joints, pair_cells)):
+            best = np.asarray(joint @ q_values.T).min(axis=1)
+            new_q_values[u] = mdp.g + gamma * np.bincount(cells, best, minlength=S)
+        new_q_values[:, mdp.walls] = 0.0
+
+        max_diff = np.abs(new_q_values - q_values).max()
+        q_values = new_q_values
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff)
+
+        if max_diff < epsilon:
+            break
+
+    return q_values, iteration_count
+
+def qmdp_policy(model: GridBeliefModel, gamma: float = 0.95, **kwargs) -> AlphaVectorPolicy:
+    """
+    QMDP controller: act as if the state became fully observable after one step,
+    argmin_u sum_x b(x) Q(u, x). The rows of Q are its alpha vectors, so every
+    decision is one (A x S) matrix-vector product, or a product over the belief's
+    cells with action_sparse().
+    """
+    q_values, _ = qmdp_q_values(model, gamma, **kwargs)
+    return AlphaVectorPolicy(q_values, np.arange(len(q_values)))
+
+def fib_policy(model: GridBeliefModel, gamma: float = 0.95, **kwargs) -> AlphaVectorPolicy:
+    """Fast informed bound controller; decisions cost the same as qmdp_policy()'s."""
+    q_values, _ = fib_q_values(model, gamma, **kwargs)
+    return AlphaVectorPolicy(q_values, np.arange(len(q_values)))
@@ -0,0 +1,137 @@
+import numpy as np
+import grid_mdp_path  # puts 5/ on the import path
+from grid_mdp import MOVES, encode_grid, slip_outcomes
+from belief import ACTIONS
+
+def systematic_resample(weights: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Indices of n draws from normalized weights, one uniform offset shared by n evenly spaced positions."""
+    positions = (rng.random() + np.arange(n)) / n
+    return np.minimum(np.searchsorted(np.cumsum(weights), positions), len(weights) - 1)
+
+class ParticleFilter:
+    """
+    Sampled belief over the grid localization POMDP of pomdp.py, for maps too large
+    for GridBeliefModel's tables.
+
+    Moves and sensor likelihoods are computed per particle from the wall mask, with
+    the same semantics as GridBeliefModel: moves are blocked by walls and
+    boundaries and slip with action_probs = [left, intended, right], and the sensor
+    reports the true cell with probability hit and each neighbour with probability
+    near, a cell with fewer than four neighbours adding the missing near mass to hit.
+    Apart from the mask, memory and time scale with the number of particles.
+
+    Particles are flat cell indices with normalized weights. They are resampled
+    systematically once the effective sample size (ESS) falls below
+    resample_threshold times their number, and the new number is chosen so the ESS
+    would have been target_ess, within [min_particles, max_particles].
+    """
+
+    def __init__(self, walls: np.ndarray, shape: tuple[int, int], action_probs: list[float], observation_probs: tuple[float, float] = (0.6, 0.1), n_particles: int = 1000, target_ess: float = 1000, min_particles: int = 100, max_particles: int = 100000, resample_threshold: float = 0.5, seed: int = 0):
+        self.walls = np.asarray(walls, dtype=bool).ravel()
+        self.shape = shape
+        self.probs = np.asarray(action_probs, dtype=np.float64)
+        self.outcomes = slip_outcomes(len(MOVES))
+        self.hit, self.near = observation_probs
+        self.target_ess = target_ess
+        self.min_particles = min_particles
+        self.max_particles = max_particles
+        self.resample_threshold = resample_threshold
+        self.rng = np.random.default_rng(seed)
+
+        self.particles = self.sample_free(n_particles)
+        self.weights = np.full(n_particles, 1.0 / n_particles)
+
+    @classmethod
+    def from_grid(cls, grid: list[list[float]], action_probs: list[float], observation_probs: tuple[float, float] = (0.6, 0.1), **kwargs) -> "ParticleFilter":
+        """Build from a list-of-lists grid with None for walls."""
+        _, walls = encode_grid(grid)
+        return cls(walls, (len(grid), len(grid[0])), action_probs, observation_probs, **kwargs)
+
+    def sample_free(self, n: int) -> np.ndarray:
+        """n cells drawn uniformly from the free cells, by rejection so no list of them is built."""
+        cells = np.empty(0, dtype=np.int64)
+        while len(cells) < n:
+            draws = self.rng.integers(0, len(self.walls), 2 * (n - len(cells)) + 16)
+            cells = np.concatenate([cells, draws[~self.walls[draws]]])
+        return cells[:n]
+
+    def reset(self, belief: np.ndarray | None = None, n_particles: int | None = None, cells: np.ndarray | None = None):
+        """
+        Redraw the particles from a flat belief, uniformly from the given cells (e.g.
+        a known start), or uniformly over the free cells.
+        """
+        n = n_particles or len(self.particles)
+        if belief is not None:
+            self.particles = self.rng.choice(len(belief), n, p=belief / belief.sum())
+        elif cells is not None:
+            self.particles = self.rng.choice(np.asarray(cells, dtype=np.int64), n)
+        else:
+            self.particles = self.sample_free(n)
+        self.weights = np.full(n, 1.0 / n)
+
+    def ess(self) -> float:
+        return float(1.0 / np.sum(self.weights ** 2))
+
+    def move(self, cells: np.ndarray, moves: np.ndarray) -> np.ndarray:
+        """Cells reached by actual moves from cells, staying put at walls and boundaries."""
+        m, n = self.shape
+        rows, cols = np.divmod(cells, n)
+        next_rows = rows + MOVES[moves, 0]
+        next_cols = cols + MOVES[moves, 1]
+        inside = (next_rows >= 0) & (next_rows < m) & (next_cols >= 0) & (next_cols < n)
+        next_cells = np.where(inside, next_rows * n + next_cols, cells)
+        return np.where(self.walls[next_cells], cells, next_cells)
+
+    def predict(self, action: str | int):
+        """Sample every particle's slip and move it."""
+        a = ACTIONS[action] if isinstance(action, str) else action
+        slips = self.rng.choice(len(self.probs), len(self.particles), p=self.probs)
+        self.particles = self.move(self.particles, self.outcomes[a, slips])
+
+    def likelihood(self, y_obs: tuple[int, int], cells: np.ndarray | None = None) -> np.ndarray:
+        """P(y_obs | x) for every particle, or for the given cells."""
+        cells = self.particles if cells is None else cells
+        y = y_obs[0] * self.shape[1] + y_obs[1]
+        neighbours = self.move(np.full(len(MOVES), y), np.arange(len(MOVES)))
+        missing = int(np.sum(neighbours == y))
+
+        rows, cols = np.divmod(cells, self.shape[1])
+        distance = np.abs(rows - y_obs[0]) + np.abs(cols - y_obs[1])
+        return np.where(distance == 0, self.hit + self.near * missing, np.where(distance == 1, self.near, 0.0))
+
+    def update(self, action: str | int, y_obs: tuple[int, int]) -> float:
+        """
+        Predict, weight by the sensor model and resample if the ESS calls for it.
+        Returns the ESS after weighting.
+
+        If no particle can explain y_obs, the particles are redrawn from the
+        cells that can produce it, weighted by their sensor likelihood.
+        """
+        self.predict(action)
+        weights = self.weights * self.likelihood(y_obs)
+        total = weights.sum()
+        if total <= 0:
+            m, n = self.shape
+            cells = np.array([y_obs[0] * n + y_obs[1]] + [r * n + c for r, c in y_obs + MOVES if 0 <= r < m and 0 <= c < n])
+            cells = cells[~self.walls[cells]]
+            likelihood = self.likelihood(y_obs, cells)
+            self.particles = cells[self.rng.choice(len(cells), len(self.particles), p=likelihood / likelihood.sum())]
+            self.weights = np.full(len(self.particles), 1.0 / len(self.particles))
+            return float(len(self.particles))
+        self.weights = weights / total
+
+        ess = self.ess()
+        if ess < self.resample_threshold * len(self.particles):
+            n = int(np.clip(np.ceil(len(self.particles) * self.target_ess / ess), self.min_particles, self.max_particles))
+            self.particles = self.particles[systematic_resample(self.weights, n, self.rng)]
+            self.weights = np.full(n, 1.0 / n)
+        return ess
+
+    def estimate(self) -> tuple[np.ndarray, np.ndarray]:
+        """The sampled belief as sorted (cells, probabilities), as GridBeliefModel.sparse() gives."""
+        cells, index = np.unique(self.particles, return_inverse=True)
+        return cells, np.bincount(index.ravel(), self.weights, minlength=len(cells))
+
+    def belief(self) -> np.ndarray:
+        """The sampled belief as a flat array over the whole map, for small maps."""
+        return np.bincount(self.particles, self.weights, minlength=len(self.walls))
@@ -0,0 +1,202 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+import grid_mdp_path  # puts 5/ on the import path
+from belief import GridBeliefModel, row_entries
+from grid_mdp import report_iteration
+
+class AlphaVectorPolicy:
+    """
+    A belief-to-action policy given by alpha vectors: the expected discounted cost
+    from belief b is min_i alphas[i] . b, and the policy takes actions[i] of the
+    minimizing vector.
+    """
+
+    def __init__(self, alphas: np.ndarray, actions: np.ndarray):
+        self.alphas = alphas
+        self.actions = actions
+
+    def values(self, beliefs: np.ndarray | sp.csr_matrix) -> np.ndarray:
+        """Expected cost of every row of a (batch, S) belief matrix."""
+        return np.asarray(beliefs @ self.alphas.T).min(axis=1)
+
+    def value(self, belief: np.ndarray) -> float:
+        return float((self.alphas @ belief).min())
+
+    def action(self, belief: np.ndarray) -> int:
+        return int(self.actions[(self.alphas @ belief).argmin()])
+
+    def action_sparse(self, cells: np.ndarray, values: np.ndarray) -> int:
+        """action() for a sparse belief (see GridBeliefModel.sparse), reading only its cells."""
+        return int(self.actions[(self.alphas[:, cells] @ values).argmin()])
+
+def sample_beliefs(model: GridBeliefModel, prior: np.ndarray, n_beliefs: int, horizon: int = 20, seed: int = 0) -> sp.csr_matrix:
+    """
+    Beliefs reachable from prior under the forward filter, as a sparse
+    (n_beliefs x S) matrix whose first row is the prior.
+
+    Trajectories start from a cell drawn from the prior, take uniformly random
+    actions and observe a sensor reading drawn for each new cell; every distinct
+    belief along the way is collected. A trajectory restarts after horizon steps.
+    Fewer rows are returned if the reachable set is smaller than n_beliefs.
+    """
+    rng = np.random.default_rng(seed)
+    # Column x of the sensor matrix lists the readings cell x can produce
+    readings = model.observations.tocsc()
+    prior = np.asarray(prior, dtype=np.float64)
+
+    rows = [model.sparse(prior)]
+    seen = {rows[0][0].tobytes() + rows[0][1].round(12).tobytes()}
+    trajectories = 0
+    while len(rows) < n_beliefs and trajectories < 10 * n_beliefs:
+        trajectories += 1
+        x = int(rng.choice(len(prior), p=prior))
+        cells, values = rows[0]
+        for _ in range(horizon):
+            action = int(rng.integers(model.mdp.n_actions))
+            x = model.mdp.step(x, action, rng)
+            start, end = readings.indptr[x], readings.indptr[x + 1]
+            y = rng.choice(readings.indices[start:end], p=readings.data[start:end])
+            cells, values, _ = model.forward_update_sparse(cells, values, action, model.mdp.cell(y))
+
+            key = cells.tobytes() + values.round(12).tobytes()
+            if key not in seen:
+                seen.add(key)
+                rows.append((cells, values))
+                if len(rows) == n_beliefs:
+                    break
+
+    lengths = [len(cells) for cells, _ in rows]
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    indices = np.concatenate([cells for cells, _ in rows])
+    data = np.concatenate([values for _, values in rows])
+    return sp.csr_matrix((data, indices, indptr), shape=(len(rows), len(prior)))
+
+def point_based_backup(model: GridBeliefModel, beliefs: sp.csr_matrix, alphas: np.ndarray, gamma: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    One point-based Bellman backup of every belief against the alpha vectors:
+
+        alpha_b(x) = g(x) + gamma sum_x' P(x'|u,x) sum_y P(y|x') alpha_{b,u,y}(x')
+
+    where alpha_{b,u,y} is the vector with the lowest cost at the belief reached from
+    b by u and y, and u is the action with the lowest cost at b. Readings that b
+    cannot produce take, for all beliefs alike, the vector with the lowest cost
+    summed over the cells that give the reading.
+
+    Returns the (n_beliefs, S) backed-up vectors, their actions and their costs at
+    their beliefs.
+    """
+    S = alphas.shape[1]
+    observations = model.observations
+    readings = observations.tocsc()
+    g = model.mdp.g
+
+    # The shared choice for every reading, and the next-step vector it gives every belief
+    default = np.asarray(observations @ alphas.T).argmin(axis=1)
+    coo = observations.tocoo()
+    shared = np.bincount(coo.col, coo.data * alphas[default[coo.row], coo.col], minlength=S)
+
+    best_values = np.full(beliefs.shape[0], np.inf)
+    best_alphas = np.empty((beliefs.shape[0], S))
+    best_actions = np.zeros(beliefs.shape[0], dtype=np.intp)
+    for a in range(model.mdp.n_actions):
+        # Joint mass of every (belief, reading, next cell) the belief can reach
+        predicted = (beliefs @ model.transitions[a]).tocoo()
+        entries, lengths = row_entries(readings, predicted.col)
+        pair_beliefs = np.repeat(predicted.row.astype(np.int64), lengths)
+        pair_readings = readings.indices[entries]
+        next_cells = np.repeat(predicted.col, lengths)
+        mass = np.repeat(predicted.data, lengths) * readings.data[entries]
+
+        # Best vector for every reachable (belief, reading) pair
+        pairs, pair_index = np.unique(pair_beliefs * S + pair_readings, return_inverse=True)
+        joint = sp.csr_matrix((mass, (pair_index.ravel(), next_cells)), shape=(len(pairs), S))
+        choice = np.asarray(joint @ alphas.T).argmin(axis=1)
+        pair_beliefs, pair_readings = np.divmod(pairs, S)
+
+        # Swap the shared choice for the pair's own on the cells that give the reading
+        entries, lengths = row_entries(observations, pair_readings)
+        cells = observations.indices[entries]
+        chosen = np.repeat(choice, lengths)
+        replaced = np.repeat(default[pair_readings], lengths)
+        delta = observations.data[entries] * (alphas[chosen, cells] - alphas[replaced, cells])
+        corrections = sp.csr_matrix((delta, (np.repeat(pair_beliefs, lengths), cells)), shape=(beliefs.shape[0], S))
+
+        new_alphas = g + gamma * (model.transitions[a] @ shared) + gamma * (corrections @ model.arrivals[a]).toarray()
+        values = np.asarray(beliefs.multiply(new_alphas).sum(axis=1)).ravel()
+
+        better = values < best_values
+        best_values[better] = values[better]
+        best_alphas[better] = new_alphas[better]
+        best_actions[better] = a
+
+    return best_alphas, best_actions, best_values
+
+def point_based_value_iteration(model: GridBeliefModel, beliefs: sp.csr_matrix, gamma: float = 0.95, epsilon: float = 1e-6, max_iterations: int = 500, observer=None) -> tuple[AlphaVectorPolicy, int]:
+    """
+    Point-based value iteration (PBVI) of the grid POMDP over a fixed belief set,
+    e.g. from sample_beliefs(), minimizing the expected discounted stage cost g.
+
+    Every iteration backs up all beliefs at once (point_based_backup). As in
+    Perseus, a belief keeps its current vector wherever the backup does not lower
+    its cost, so the values at the beliefs never increase. Vectors that are not the
+    best one for any belief are pruned. The vectors start from the single
+    pessimistic max(g) / (1 - gamma).
+
+    Returns the policy and the number of iterations performed.
+    """
+    free = model.mdp.free
+    alphas = np.full((1, len(model.walls)), model.mdp.g[free].max() / (1 - gamma))
+    actions = np.zeros(1, dtype=np.intp)
+    values = np.asarray(beliefs @ alphas.T).min(axis=1)
+    start = time.perf_counter()
+
+    iteration_count = 0
+    while iteration_count < max_iterations:
+        new_alphas, new_actions, new_values = point_based_backup(model, beliefs, alphas, gamma)
+
+        # Keep the current best vector of beliefs the backup did not improve
+        current = np.asarray(beliefs @ alphas.T).argmin(axis=1)
+        keep = new_values >= values
+        new_alphas[keep] = alphas[current[keep]]
+        new_actions[keep] = actions[current[keep]]
+
+        # Drop duplicates, then vectors that are the best one for no belief
+        new_alphas, index = np.unique(new_alphas, axis=0, return_index=True)
+        new_actions = new_actions[index]
+        costs = np.asarray(beliefs @ new_alphas.T)
+        used = np.unique(costs.argmin(axis=1))
+        alphas, actions = new_alphas[used], new_actions[used]
+        new_values = costs.min(axis=1)
+
+        max_diff = np.abs(new_values - values).max()
+        values = new_values
+        iteration_count += 1
+        report_iteration(observer, start, iteration_count, max_diff)
+
+        if max_diff < epsilon:
+            break
+
+    return AlphaVectorPolicy(alphas, actions), iteration_count
+
+if __name__ == '__main__':
+    from rich import print
+    from belief import ACTIONS
+
+    # The map of pomdp.py, with its values as stage costs
+    grid = [
+        [0, 0, 0, -1],
+        [0, None, 0, 100],
+        [0, 0, 0, 0]
+    ]
+    model = GridBeliefModel.from_grid(grid, [.1, .8, .1], observation_probs=(0.6, 0.1))
+    prior = np.where(model.walls, 0.0, 1.0) / (~model.walls).sum()
+    beliefs = sample_beliefs(model, prior, 200)
+    policy, iterations = point_based_value_iteration(model, beliefs, gamma=0.9)
+    print(f"{beliefs.shape[0]} beliefs, {len(policy.alphas)} alpha vectors after {iterations} iterations")
+    print(f"Cost from the uniform belief: {policy.value(prior):.3f}")
+
+    # Action when the robot is sure of its cell
+    names = {index: name for name, index in ACTIONS.items()}
+    for i, row in enumerate(grid):
+        print([None if cell is None else names[policy.action(np.eye(len(model.walls))[i * len(row) + j])] for j, cell in enumerate(row)])
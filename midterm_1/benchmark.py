@@ -0,0 +1,112 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+from rich import print
+from graph_dp import CompiledGraph, StochasticGraph, finite_horizon_dp, intended_outcomes, stochastic_dp
+
+def layered_graph(layers: int, width: int, degree: int = 3, seed: int = 0) -> CompiledGraph:
+    """layers * width nodes; each links to degree random nodes of the next layer, and the last layer to itself."""
+    rng = np.random.default_rng(seed)
+    N = layers * width
+    layer = np.arange(N) // width
+    next_layer = np.minimum(layer + 1, layers - 1)
+    indices = next_layer[:, None] * width + rng.integers(0, width, (N, degree))
+    indptr = np.arange(N + 1) * degree
+    return CompiledGraph([str(i) for i in range(N)], indptr, indices.ravel())
+
+def layered_stochastic_graph(layers: int, width: int, degree: int = 3, p_intended: float = 0.75, seed: int = 0) -> StochasticGraph:
+    """
+    layered_graph() with intended_outcomes(): every node has one action per
+    successor, reaching it with p_intended and each other successor evenly otherwise.
+    """
+    graph = layered_graph(layers, width, degree, seed)
+    N = graph.n_nodes
+    successors = graph.indices.reshape(N, degree)
+    probs = np.where(np.eye(degree, dtype=bool), p_intended, (1 - p_intended) / max(degree - 1, 1))
+    if degree == 1:
+        probs = np.ones((1, 1))
+    # Row (n, i) heads for successor i of node n and spreads over all of n's successors
+    indices = np.repeat(successors, degree, axis=0).ravel()
+    data = np.tile(probs.ravel(), N)
+    indptr = np.arange(N * degree + 1) * degree
+    transitions = sp.csr_matrix((data, indices, indptr), shape=(N * degree, N))
+    return StochasticGraph(graph.nodes, np.arange(N + 1) * degree, transitions, successors.ravel().tolist())
+
+def loop_dp(graph: dict[str, list[str]], cost_table: dict[str, list[float]]) -> dict[str, list[float]]:
+    """The dict-based backward induction of q1b.py, values only."""
+    K = len(next(iter(cost_table.values())))
+    value_table = {n: [None] * K for n in graph}
+    for n in graph:
+        value_table[n][K - 1] = cost_table[n][K - 1]
+    for k in range(K - 1)[::-1]:
+        for n in graph:
+            value_table[n][k] = cost_table[n][k] + min(value_table[path][k + 1] for path in graph[n])
+    return value_table
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_graph_dp(problems: list[tuple[int, int, int]], stages: int, loop_limit: int = 10**4):
+    print(f"\nFinite-horizon graph DP, {stages} stages")
+    print(f"{'nodes':<10} {'edges':<10} {'tables':<8} {'loop':<10} {'vectorized':<10}")
+
+    for layers, width, degree in problems:
+        graph = layered_graph(layers, width, degree)
+        N = graph.n_nodes
+        # Stage-invariant costs as a broadcast view, so the (K, N) array takes no memory
+        costs = np.broadcast_to(np.random.default_rng(0).random(N), (stages, N))
+        return_tables = stages * N <= 10**8
+
+        (values, _), vector_time = timed(finite_horizon_dp, graph, costs, return_tables)
+
+        loop_time = None
+        if N <= loop_limit:
+            names = graph.nodes
+            graph_dict = {names[i]: [names[j] for j in graph.indices[graph.indptr[i]:graph.indptr[i + 1]]] for i in range(N)}
+            cost_table = {names[i]: costs[:, i].tolist() for i in range(N)}
+            value_table, loop_time = timed(loop_dp, graph_dict, cost_table)
+            assert np.allclose([value_table[name][0] for name in names], values[0])
+
+        loop = "-" if loop_time is None else f"{loop_time:.2f}s"
+        print(f"{N:<10} {len(graph.indices):<10} {str(return_tables):<8} {loop:<10} {vector_time:.2f}s")
+
+def stochastic_loop_dp(outcomes: dict[str, dict[str, dict[str, float]]], cost_table: dict[str, list[float]]) -> dict[str, list[float]]:
+    """The dict-based backward induction of q1c.py for any outcome model, values only."""
+    K = len(next(iter(cost_table.values())))
+    value_table = {n: [None] * K for n in outcomes}
+    for n in outcomes:
+        value_table[n][K - 1] = cost_table[n][K - 1]
+    for k in range(K - 1)[::-1]:
+        for n in outcomes:
+            value_table[n][k] = cost_table[n][k] + min(sum(p * value_table[m][k + 1] for m, p in distribution.items()) for distribution in outcomes[n].values())
+    return value_table
+
+def bench_stochastic_dp(problems: list[tuple[int, int, int]], stages: int, loop_limit: int = 10**4):
+    print(f"\nStochastic graph DP, {stages} stages")
+    print(f"{'nodes':<10} {'outcomes':<10} {'tables':<8} {'loop':<10} {'vectorized':<10}")
+
+    for layers, width, degree in problems:
+        graph = layered_stochastic_graph(layers, width, degree)
+        N = graph.n_nodes
+        costs = np.broadcast_to(np.random.default_rng(0).random(N), (stages, N))
+        return_tables = stages * N <= 10**8
+
+        (values, _), vector_time = timed(stochastic_dp, graph, costs, return_tables)
+
+        loop_time = None
+        if N <= loop_limit:
+            names = graph.nodes
+            layers_graph = layered_graph(layers, width, degree)
+            graph_dict = {names[i]: [names[j] for j in layers_graph.indices[layers_graph.indptr[i]:layers_graph.indptr[i + 1]]] for i in range(N)}
+            cost_table = {names[i]: costs[:, i].tolist() for i in range(N)}
+            value_table, loop_time = timed(stochastic_loop_dp, intended_outcomes(graph_dict), cost_table)
+            assert np.allclose([value_table[name][0] for name in names], values[0])
+
+        loop = "-" if loop_time is None else f"{loop_time:.2f}s"
+        print(f"{N:<10} {graph.transitions.nnz:<10} {str(return_tables):<8} {loop:<10} {vector_time:.2f}s")
+
+if __name__ == '__main__':
+    bench_graph_dp([(10, 100, 3), (100, 1000, 3), (1000, 1000, 3)], stages=1000)
+    bench_stochastic_dp([(10, 100, 3), (100, 1000, 3), (1000, 1000, 3)], stages=1000)
@@ -0,0 +1,304 @@
+import numpy as np
+import scipy.sparse as sp
+from rich import print
+
+class CompiledGraph:
+    """
+    A dict[str, list[str]] graph, as in q1b.py, compiled into CSR adjacency: the
+    successors of node i are indices[indptr[i]:indptr[i + 1]], in the order the
+    dict lists them. Node names map to indices in the order of the dict.
+
+    When out-degrees are even enough that padding costs at most twice the edges,
+    the successors are also laid out as a (max_degree, N) table, padded with N, like
+    the grid successor tables; minimizing over it is a few elementwise passes
+    instead of a segmented reduction.
+    """
+
+    def __init__(self, nodes: list[str], indptr: np.ndarray, indices: np.ndarray):
+        self.nodes = list(nodes)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+
+        self.padded = pad_segments(self.indptr, self.indices, self.n_nodes)
+
+    @classmethod
+    def from_dict(cls, graph: dict[str, list[str]]) -> "CompiledGraph":
+        nodes = list(graph.keys())
+        index = {node: i for i, node in enumerate(nodes)}
+        indptr = np.cumsum([0] + [len(graph[node]) for node in nodes])
+        indices = [index[successor] for node in nodes for successor in graph[node]]
+        return cls(nodes, indptr, indices)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    def successor_min(self, values: np.ndarray, argmin: bool = True) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        min over the successors of every node of values, and with argmin=True the
+        first minimizing successor (see segment_argmin), -1 where there is none.
+        """
+        return segment_min(values, self.indptr, self.indices, self.padded, argmin)
+
+    def stage_costs(self, cost_table: dict[str, list[float]]) -> np.ndarray:
+        """Stack a per-node list of stage costs into a (K, N) array."""
+        return np.array([cost_table[node] for node in self.nodes], dtype=np.float64).T
+
+    def tables(self, values: np.ndarray, policy: np.ndarray) -> tuple[dict[str, list], dict[str, list]]:
+        """(K, N) value and policy arrays as q1b.py's value_table and optimal_path dicts."""
+        value_table = {node: values[:, i].tolist() for i, node in enumerate(self.nodes)}
+        optimal_path = {node: [None if j < 0 else self.nodes[j] for j in policy[:, i]] for i, node in enumerate(self.nodes)}
+        return value_table, optimal_path
+
+def segment_argmin(values: np.ndarray, indptr: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum of every CSR segment values[indptr[i]:indptr[i + 1]] and the position
+    of its first minimizer, as a loop keeping the first value strictly smaller than
+    the best so far, starting from inf, would find it. Empty segments, and segments
+    that are all inf, give inf and -1.
+    """
+    lengths = np.diff(indptr)
+    nonempty = lengths > 0
+    starts = indptr[:-1][nonempty]
+
+    mins = np.full(len(lengths), np.inf)
+    first = np.full(len(lengths), -1, dtype=np.int64)
+    if len(starts) == 0:
+        return mins, first
+
+    mins[nonempty] = np.minimum.reduceat(values, starts)
+    positions = np.arange(len(values))
+    candidates = np.where(values == np.repeat(mins, lengths), positions, len(values))
+    first[nonempty] = np.minimum.reduceat(candidates, starts)
+    first[mins == np.inf] = -1
+    return mins, first
+
+def pad_segments(indptr: np.ndarray, indices: np.ndarray, fill: int) -> np.ndarray | None:
+    """
+    CSR segments laid out as a (max_length, n_segments) int32 table padded with
+    fill, or None when the padding would more than double the entries.
+    """
+    N = len(indptr) - 1
+    lengths = np.diff(indptr)
+    max_length = int(lengths.max(initial=0))
+    if max_length * N > 2 * len(indices):
+        return None
+    padded = np.full((max_length, N), fill, dtype=np.int32)
+    slots = np.arange(len(indices)) - np.repeat(indptr[:-1], lengths)
+    padded[slots, np.repeat(np.arange(N), lengths)] = indices
+    return padded
+
+def segment_min(values: np.ndarray, indptr: np.ndarray, indices: np.ndarray, padded: np.ndarray | None = None, argmin: bool = True) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    min of values over the indices of every CSR segment and, with argmin=True, the
+    first minimizing index (see segment_argmin), -1 where none is finite.
+
+    With the segments' pad_segments() table, padded with len(values), this is a few
+    elementwise passes instead of a segmented reduction.
+    """
+    N = len(indptr) - 1
+    if padded is None:
+        best, position = segment_argmin(values[indices], indptr)
+        if not argmin:
+            return best, None
+        chosen = np.full(N, -1, dtype=np.int32)
+        found = position >= 0
+        chosen[found] = indices[position[found]]
+        return best, chosen
+
+    if len(padded) == 0:
+        return np.full(N, np.inf), np.full(N, -1, dtype=np.int32) if argmin else None
+
+    # The padding points at a trailing inf, which never wins
+    extended = np.append(values, np.inf)
+    best = extended[padded[0]]
+    slot = np.zeros(N, dtype=np.intp)
+    for j in range(1, len(padded)):
+        candidate = extended[padded[j]]
+        if argmin:
+            better = candidate < best
+            best[better] = candidate[better]
+            slot[better] = j
+        else:
+            np.minimum(best, candidate, out=best)
+    if not argmin:
+        return best, None
+    chosen = padded[slot, np.arange(N)]
+    chosen[best == np.inf] = -1
+    return best, chosen
+
+def finite_horizon_dp(graph: CompiledGraph, costs: np.ndarray, return_tables: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Backward induction for the K-stage shortest path of q1b.py:
+
+        V_{K-1}(n) = c_{K-1}(n),   V_k(n) = c_k(n) + min_{m in graph[n]} V_{k+1}(m)
+
+    costs is a (K, N) array, which may be a broadcast view for stage-invariant
+    costs. Every stage is one gather over the edges and one segment-min (see
+    CompiledGraph.successor_min).
+
+    Returns the (K, N) value table and the (K, N) int32 table of minimizing
+    successors; a node stays put at the last stage and has -1 where it has no
+    successors. With return_tables=False only stage 0 of both is kept and returned,
+    so memory does not grow with K.
+    """
+    K, N = costs.shape
+    stored = K if return_tables else 1
+    values = np.empty((stored, N))
+    policy = np.empty((stored, N), dtype=np.int32)
+
+    next_values = np.asarray(costs[K - 1], dtype=np.float64)
+    values[-1] = next_values
+    policy[-1] = np.arange(N)
+    for k in range(K - 2, -1, -1):
+        # Minimizers are only worked out for the stages that are kept
+        best, successors = graph.successor_min(next_values, argmin=return_tables or k == 0)
+        next_values = costs[k] + best
+        row = k if return_tables else 0
+        values[row] = next_values
+        if successors is not None:
+            policy[row] = successors
+
+    return values, policy
+
+class StochasticGraph:
+    """
+    A graph whose actions lead to random successors, compiled from
+
+        {node: {action: {successor: probability}}}
+
+    into a sparse (n_actions x N) transition matrix, one row per (node, action)
+    with the rows of node i at action_ptr[i]:action_ptr[i + 1]; that is the
+    (N, actions, N) outcome tensor with its first two axes flattened.
+    """
+
+    def __init__(self, nodes: list[str], action_ptr: np.ndarray, transitions: sp.csr_matrix, action_labels: list | None = None):
+        self.nodes = list(nodes)
+        self.action_ptr = np.asarray(action_ptr, dtype=np.int64)
+        self.transitions = sp.csr_matrix(transitions)
+        self.transitions.indices = self.transitions.indices.astype(np.int32)
+        self.action_labels = list(range(self.transitions.shape[0])) if action_labels is None else list(action_labels)
+
+        self.action_index = np.arange(self.transitions.shape[0], dtype=np.int32)
+        self.padded = pad_segments(self.action_ptr, self.action_index, len(self.action_index))
+
+    @classmethod
+    def from_dict(cls, outcomes: dict[str, dict[str, dict[str, float]]]) -> "StochasticGraph":
+        nodes = list(outcomes.keys())
+        index = {node: i for i, node in enumerate(nodes)}
+        action_ptr = np.cumsum([0] + [len(outcomes[node]) for node in nodes])
+        labels, rows, cols, probs = [], [], [], []
+        for node in nodes:
+            for label, distribution in outcomes[node].items():
+                for successor, p in distribution.items():
+                    rows.append(len(labels))
+                    cols.append(index[successor])
+                    probs.append(p)
+                labels.append(label)
+        transitions = sp.csr_matrix((probs, (rows, cols)), shape=(len(labels), len(nodes)))
+        return cls(nodes, action_ptr, transitions, labels)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.action_ptr) - 1
+
+    def stage_costs(self, cost_table: dict[str, list[float]]) -> np.ndarray:
+        """Stack a per-node list of stage costs into a (K, N) array."""
+        return np.array([cost_table[node] for node in self.nodes], dtype=np.float64).T
+
+    def tables(self, values: np.ndarray, policy: np.ndarray) -> tuple[dict[str, list], dict[str, list]]:
+        """
+        (K, N) value and action arrays as q1c.py's value_table and optimal_path
+        dicts, with action labels and the node itself at the last stage.
+        """
+        value_table = {node: values[:, i].tolist() for i, node in enumerate(self.nodes)}
+        optimal_path = {
+            node: [None if a < 0 else self.action_labels[a] for a in policy[:-1, i]] + [node]
+            for i, node in enumerate(self.nodes)
+        }
+        return value_table, optimal_path
+
+def intended_outcomes(graph: dict[str, list[str]], p_intended: float = 0.75) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    The outcome model of q1c.py for any out-degree: heading for a successor
+    reaches it with p_intended and one of the node's other successors otherwise,
+    evenly. A node with a single successor always reaches it. Actions are labelled
+    by the successor they head for.
+    """
+    outcomes = {}
+    for node, successors in graph.items():
+        outcomes[node] = {}
+        for i, target in enumerate(successors):
+            others = successors[:i] + successors[i + 1:]
+            distribution = {target: p_intended if others else 1.0}
+            for other in others:
+                distribution[other] = distribution.get(other, 0.0) + (1 - p_intended) / len(others)
+            outcomes[node].setdefault(target, distribution)
+    return outcomes
+
+def stochastic_dp(graph: StochasticGraph, costs: np.ndarray, return_tables: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Backward induction with random outcomes, as in q1c.py:
+
+        V_{K-1}(n) = c_{K-1}(n),   V_k(n) = c_k(n) + min_u sum_m P(m | n, u) V_{k+1}(m)
+
+    Every stage is one sparse product for the expectations of all actions and one
+    segment-min over each node's actions. Returns the (K, N) value table and the
+    (K, N) int32 table of chosen action rows, -1 at the last stage and where a node
+    has no action; return_tables works as in finite_horizon_dp().
+    """
+    K, N = costs.shape
+    stored = K if return_tables else 1
+    values = np.empty((stored, N))
+    policy = np.empty((stored, N), dtype=np.int32)
+
+    next_values = np.asarray(costs[K - 1], dtype=np.float64)
+    values[-1] = next_values
+    policy[-1] = -1
+    for k in range(K - 2, -1, -1):
+        expected = graph.transitions @ next_values
+        best, actions = segment_min(expected, graph.action_ptr, graph.action_index, graph.padded, argmin=return_tables or k == 0)
+        next_values = costs[k] + best
+        row = k if return_tables else 0
+        values[row] = next_values
+        if actions is not None:
+            policy[row] = actions
+
+    return values, policy
+
+if __name__ == '__main__':
+    # The graph and stage costs of q1b.py and q1c.py
+    graph = {
+        'A': ['B', 'C'],
+        'B': ['B', 'D'],
+        'C': ['B', 'D'],
+        'D': ['A', 'D']
+    }
+
+    cost_table = {
+        'A': [1, 2, 3, 4, 0],
+        'B': [4, 3, 2, 1, 5],
+        'C': [2, 1, 2, 1, 5],
+        'D': [0, 5, 0, 5, 0]
+    }
+
+    compiled = CompiledGraph.from_dict(graph)
+    values, policy = finite_horizon_dp(compiled, compiled.stage_costs(cost_table))
+    value_table, optimal_path = compiled.tables(values, policy)
+
+    print("Value Table:")
+    print(value_table)
+
+    print("Optimal Path Table:")
+    print(optimal_path)
+
+    # q1c.py: the intended successor is reached with probability .75
+    stochastic = StochasticGraph.from_dict(intended_outcomes(graph, 0.75))
+    values, policy = stochastic_dp(stochastic, stochastic.stage_costs(cost_table))
+    value_table, optimal_path = stochastic.tables(values, policy)
+
+    print("Stochastic Value Table:")
+    print(value_table)
+
+    print("Stochastic Optimal Path Table:")
+    print(optimal_path)
@@ -0,0 +1,10 @@
+"""
+Puts 5/, where grid_mdp lives, on the import path. Modules of this directory that
+use grid_mdp import this first, so they work from any entry script.
+"""
+import sys
+from pathlib import Path
+
+GRID_MDP_DIR = str(Path(__file__).resolve().parent.parent / "5")
+if GRID_MDP_DIR not in sys.path:
+    sys.path.append(GRID_MDP_DIR)
@@ -1,7 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import random
+import heapq
 from tqdm import tqdm
+import grid_mdp_path  # puts 5/ on the import path
+from grid_mdp import GridMDP
 
 def _eta_for(eta, state, t, N_visits):
     if isinstance(eta, (float, int)):
@@ -218,94 +221,213 @@ class OptimalAgent:
         self.width = env.width
         self.actions = env.get_actions()
         self.perp = {0: [3, 1], 1: [0, 2], 2: [3, 1], 3: [0, 2]}
+
+        # Compile the moves once: cliff cells block like walls, and outcome k of action a
+        # is the k-th of [a, perp[a][0], perp[a][1]]
+        cliff = np.zeros((self.height, self.width), dtype=bool)
+        for cell in env.cliff:
+            cliff[cell] = True
+        self.model = GridMDP(
+            cliff, (self.height, self.width),
+            [env.prob_correct_action, env.prob_left, env.prob_right],
+            moves=[(-1, 0), (0, 1), (1, 0), (0, -1)],  # UP, RIGHT, DOWN, LEFT
+            outcomes=[[a] + self.perp[a] for a in self.actions],
+            blocking=True
+        )
+        self._moves = self.model.moves.tolist()
+        self._successors = self.model.successors.tolist()
+        self._probs = self.model.probs.tolist()
+        self._goal = env.goal_state[0] * self.width + env.goal_state[1]
+
         self.V = np.zeros((self.height, self.width))
         self.policy = np.zeros((self.height, self.width), dtype=int)
+        self.Q = np.zeros((self.height, self.width, len(self.actions)))
 
     def _step_det(self, state, actual_action):
-        x, y = state
-        if actual_action == 0:
-            x = max(x - 1, 0)
-        elif actual_action == 1:
-            y = min(y + 1, self.width - 1)
-        elif actual_action == 2:
-            x = min(x + 1, self.height - 1)
-        elif actual_action == 3:
-            y = max(y - 1, 0)
-        next_state = (x, y)
-        if next_state in self.env.cliff:
-            next_state = state
-        return next_state
+        return divmod(self._moves[actual_action][state[0] * self.width + state[1]], self.width)
+
+    def _sweep_order(self, mode):
+        states = [(i, j) for i in range(self.height) for j in range(self.width)]
+        if mode != "distance":
+            return states
 
-    def value_iteration(self, epsilon=1e-8, max_iter=10000):
+        # Breadth-first distance from the goal, so values flow outward in one sweep
+        goal = self.env.goal_state
+        distance = {goal: 0}
+        frontier = [goal]
+        while frontier:
+            next_frontier = []
+            for s in frontier:
+                for a in self.actions:
+                    s_next = self._step_det(s, a)
+                    if s_next not in distance:
+                        distance[s_next] = distance[s] + 1
+                        next_frontier.append(s_next)
+            frontier = next_frontier
+        return sorted(states, key=lambda s: distance.get(s, float('inf')))
+
+    def _backup(self, V, s, Q=None):
+        # Q, if given, records the action values this backup computed for s
+        goal = self._goal
+        x = s[0] * self.width + s[1]
+        q_vals = []
+        for a in self.actions:
+            exp = 0.0
+            for p, outcome in zip(self._probs, self._successors[a]):
+                r = -1.0
+                x_next = outcome[x]
+                v_next = 0.0 if x_next == goal else V.item(x_next)
+                exp += p * (r + self.gamma * v_next)
+            q_vals.append(exp)
+        if Q is not None:
+            Q[s] = q_vals
+        return max(q_vals)
+
+    def _prioritized_sweeping(self, epsilon, max_iter, Q):
+        goal = self.env.goal_state
+        states = [(i, j) for i in range(self.height) for j in range(self.width) if (i, j) != goal]
+
+        # weights[s][s_prev] = gamma * max_a P(s | s_prev, a): how far a change of V(s)
+        # can move the Bellman error of s_prev
+        weights = {s: {} for s in states}
+        weights[goal] = {}
+        for s in states:
+            x = s[0] * self.width + s[1]
+            for a in self.actions:
+                mass = {}
+                for p, outcome in zip(self._probs, self._successors[a]):
+                    s_next = divmod(outcome[x], self.width)
+                    mass[s_next] = mass.get(s_next, 0.0) + p
+                for s_next, p in mass.items():
+                    weights[s_next][s] = max(weights[s_next].get(s, 0.0), self.gamma * p)
+
+        # A backup leaves its state's error at 0; every change then adds to the error
+        # bounds of the predecessors, which are queued once their bound reaches epsilon
         V = np.zeros((self.height, self.width))
+        bound = {s: abs(self._backup(V, s, Q) - V[s]) for s in states}
+        queued = {s for s in states if bound[s] >= epsilon}
+        heap = [(-bound[s], s) for s in queued]
+        heapq.heapify(heap)
+
+        backups = len(states)
+        while heap and backups < max_iter * len(states):
+            _, s = heapq.heappop(heap)
+            queued.discard(s)
+            new_value = self._backup(V, s, Q)
+            change = abs(new_value - V[s])
+            V[s] = new_value
+            bound[s] = 0.0
+            backups += 1
+
+            for s_prev, w in weights[s].items():
+                bound[s_prev] += w * change
+                if bound[s_prev] >= epsilon and s_prev not in queued:
+                    queued.add(s_prev)
+                    heapq.heappush(heap, (-bound[s_prev], s_prev))
+
+        # Action values of the final V for the greedy policy
+        for s in states:
+            self._backup(V, s, Q)
+        backups += len(states)
+
+        if not heap:
+            print(f"Prioritized sweeping converged in {backups} backups (~{backups / len(states):.1f} sweeps), seeding and policy passes included")
+        else:
+            print(f"Prioritized sweeping did not converge in {max_iter} sweeps' worth of backups, outputting last iteration")
+        return V
+
+    def value_iteration(self, epsilon=1e-8, max_iter=10000, mode="jacobi", stopping="sup", return_q=False, precision="double"):
+        """
+        mode:
+            "jacobi"        -- synchronous sweeps into a fresh copy of V
+            "gauss_seidel"  -- in-place sweeps in row-major order
+            "distance"      -- in-place sweeps ordered by distance from the goal
+            "prioritized"   -- single-state backups driven by a heap of Bellman error bounds;
+                               it only beats the sweeping modes when a few states
+                               drive the solve
+
+        stopping:
+            "sup"   -- stop when no state changes by epsilon or more in a sweep
+            "span"  -- (jacobi only) stop when the MacQueen bounds on V* are less than
+                       epsilon apart, and return their midpoint
+
+        precision:
+            "double"  -- float64 values
+            "mixed"   -- (sweeping modes only) float32 values with backups accumulated
+                         in double; once rounding stalls the float32 sweeps, float64
+                         sweeps polish the result with the same stopping rule
+
+        The greedy policy is read off the action values of each state's last backup,
+        so it needs no extra pass over the states. With return_q=True those action
+        values are returned too, as a (height, width, n_actions) array.
+        """
+        if mode not in ("jacobi", "gauss_seidel", "distance", "prioritized"):
+            raise ValueError(f"Unknown value iteration mode: {mode}")
+        if stopping not in ("sup", "span") or (stopping == "span" and mode != "jacobi"):
+            raise ValueError(f"Unsupported stopping rule {stopping} for mode {mode}")
+        if precision not in ("double", "mixed") or (precision == "mixed" and mode == "prioritized"):
+            raise ValueError(f"Unsupported precision {precision} for mode {mode}")
+
+        V = np.zeros((self.height, self.width), dtype=np.float32 if precision == "mixed" else np.float64)
+        Q = np.zeros((self.height, self.width, len(self.actions)))
         goal = self.env.goal_state
-        prob_correct_action, prob_left, prob_right = self.env.prob_correct_action, self.env.prob_left, self.env.prob_right
-        
-        iterations = 0
-        for _ in range(max_iter):
-            iterations += 1
-            delta = 0.0
-            V_new = V.copy()
-            for i in range(self.height):
-                for j in range(self.width):
-                    s = (i, j)
+
+        if mode == "prioritized":
+            V = self._prioritized_sweeping(epsilon, max_iter, Q)
+            iterations = 0
+        else:
+            order = self._sweep_order(mode)
+            iterations = 0
+            for _ in range(max_iter):
+                iterations += 1
+                delta = 0.0
+                # In-place modes read the values written earlier in the same sweep
+                V_new = V.copy() if mode == "jacobi" else V
+                for s in order:
+                    i, j = s
                     if s == goal:
                         V_new[i, j] = 0.0
                         continue
-                    q_vals = []
-                    for a in self.actions:
-                        next_states = [
-                            self._step_det(s, a),
-                            self._step_det(s, self.perp[a][0]),
-                            self._step_det(s, self.perp[a][1])
-                        ]
-                        probs = [prob_correct_action, prob_left, prob_right]
-                        # aggregate in case of duplicates
-                        exp = 0.0
-                        for p, s_next in zip(probs, next_states):
-                            r = -1.0
-                            v_next = 0.0 if s_next == goal else V[s_next[0], s_next[1]]
-                            exp += p * (r + self.gamma * v_next)
-                        q_vals.append(exp)
-                    V_new[i, j] = max(q_vals)
-                    delta = max(delta, abs(V_new[i, j] - V[i, j]))
-            V = V_new
-            if delta < epsilon:
-                break
+                    old = V[i, j]
+                    V_new[i, j] = self._backup(V, s, Q)
+                    delta = max(delta, abs(V_new[i, j] - old))
+
+                if V_new.dtype == np.float32:
+                    # Switch to float64 once the float32 sweeps reach rounding level
+                    if delta < max(epsilon, 4 * np.finfo(np.float32).eps * np.abs(V_new).max()):
+                        V_new = V_new.astype(np.float64)
+                    V = V_new
+                    continue
 
-        if iterations < max_iter:
-            print(f"Value iteration converged in {iterations} iterations")
-        else:
-            print(f"Value iteration did not converge in {max_iter} iterations, outputting last iteration")
-
-        # Derive greedy policy
-        pi = np.zeros((self.height, self.width), dtype=int)
-        for i in range(self.height):
-            for j in range(self.width):
-                s = (i, j)
-                if s == goal:
-                    pi[i, j] = 0
+                if stopping == "span":
+                    # The goal absorbs with value 0, so 0 is part of the bound
+                    diff = np.delete((V_new - V).ravel(), goal[0] * self.width + goal[1])
+                    scale = self.gamma / (1 - self.gamma)
+                    lo, hi = scale * min(diff.min(), 0.0), scale * max(diff.max(), 0.0)
+                    V = V_new
+                    if hi - lo < epsilon:
+                        V = V + (lo + hi) / 2
+                        V[goal] = 0.0
+                        break
                     continue
-                best_a = 0
-                best_q = -1e18
-                for a in self.actions:
-                    next_states = [
-                        self._step_det(s, a),
-                        self._step_det(s, self.perp[a][0]),
-                        self._step_det(s, self.perp[a][1])
-                    ]
-                    probs = [prob_correct_action, prob_left, prob_right]
-                    q = 0.0
-                    for p, s_next in zip(probs, next_states):
-                        r = -1.0
-                        v_next = 0.0 if s_next == goal else V[s_next[0], s_next[1]]
-                        q += p * (r + self.gamma * v_next)
-                    if q > best_q:
-                        best_q = q
-                        best_a = a
-                pi[i, j] = best_a
+
+                V = V_new
+                if delta < epsilon:
+                    break
+
+            if iterations < max_iter:
+                print(f"Value iteration converged in {iterations} iterations")
+            else:
+                print(f"Value iteration did not converge in {max_iter} iterations, outputting last iteration")
+
+        # Greedy policy from the last backups; argmax keeps the first of tied actions
+        pi = np.array(self.actions)[Q.argmax(axis=2)]
+        pi[goal] = 0
         self.V = V
         self.policy = pi
+        self.Q = Q
+        if return_q:
+            return V, pi, Q
         return V, pi
 
     def evaluate(self, num_episodes):